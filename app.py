@@ -1,10 +1,21 @@
+import time
+
+launch_time = time.perf_counter()  # for the time-to-first-window measured in main()
+
 from daq import *
+
+if __name__ == "__main__":
+    start_discovery()  # enumerate the DAQ devices in the background while the rest of the app is imported
+
 from report import *
 from signal_analysis import *
+from project import *
+from decimation import MinMaxPyramid
+from live_trace import TraceWidget
 import json
 import os
+import functools
 import sys
-import random
 import matplotlib
 import profig
 
@@ -18,8 +29,6 @@ from matplotlib.backends.backend_qtagg import (
     NavigationToolbar2QT as NavigationToolbar,
 )
 from matplotlib.figure import Figure
-import matplotlib.pyplot as plt
-import matplotlib.animation as animation
 
 grey1 = QColor("#F8F9FA")
 grey2 = QColor("#E9ECEF")
@@ -27,22 +36,34 @@ grey3 = QColor("#DEE2E6")
 grey4 = QColor("#CED4DA")
 grey5 = QColor("#ADB5BD")
 
+# widgets the live graph can be drawn on (init.cfg live_graph_view)
+LIVE_VIEWS = ["Matplotlib", "Trace (scrolling)", "Trace (strip chart)"]
+
 
 # create DAQ to be used in application
-reader = Reader()
+# SUCT_READER=process runs the read loop in a child process that shares its buffer with the app
+if os.environ.get("SUCT_READER", "thread").lower() == "process":
+    reader = ProcessReader()
+else:
+    reader = Reader()
 
 # create Signal Generator for testing
 generator = Generator()
 
-# create signal analysis object
-analyzer = Analyzer()
+# worker processes that analyse the tests of a suite in parallel
+analysis_pool = AnalysisPool()
 
 
 # holds signal
 class Communicate(QObject):
     testDone = Signal()
+    readDone = Signal()  # emitted from the reader thread when a test's acquisition completes
     testListChanged = Signal()
     testSuiteChanged = Signal()
+    # (analysis run, suite index, Future of the test's step list), emitted from the analysis pool's threads
+    stepsReady = Signal(int, int, object)
+    analysisDone = Signal()  # every test of the finished suite has been analysed
+    resultsCleared = Signal()  # the captures and results were dropped, analysis still running is stale
 
 
 # horizontal divider
@@ -92,6 +113,9 @@ class TestRunner(QWidget):
         self.configuredTests = self.parent().configuredTests
         self.results = self.parent().results
         self.testData = self.parent().testData
+        self.testChannels = self.parent().testChannels
+        self.testErrors = self.parent().testErrors
+        self.streamResults = self.parent().streamResults
         self.comm = self.parent().comm
         self.inputDevices = reader.ai_channels
         self.outputDevices = generator.ao_channels
@@ -99,19 +123,36 @@ class TestRunner(QWidget):
         self.canvas = MplCanvas(
             self, width=5, height=4, dpi=100
         )  # Matplotlib canvas where live graph is shown
-        self.n_data = 50  # number of data points required to start graphing
+        init = self.parent().init
+        self.n_data = init["live_graph_points"]  # number of most recent samples shown in the live graph
+        self.liveRate = None  # sample rate the live graph's time axis is laid out for
+        self.liveX = np.zeros(0)  # times (s, relative to the newest sample) of the live graph's points
+        self.liveBackground = None  # the live graph without its line, restored before each blit
+        self.init = init
+        # lighter live view painted with QPainter, shown instead of the canvas when selected
+        self.trace = TraceWidget(reader, self.n_data)
         self.currTest = 0  # iterator to indicate which test is running
         self.testsFinished = True  # State to see if tests are still running
+        self.sharingCapture = False  # State to see if the current test reuses the previous test's capture
+        self.streamer = None  # StreamingAnalyzer of the capture being read
+        self.streamRow = 0  # row of the capture the streamer analyses
 
         toolbar = NavigationToolbar(self.canvas, self)
 
-        self.update_plot()
+        # the line is animated: full draws leave it out and update_plot blits it over the saved background
+        (self.liveLine,) = self.canvas.axes.plot([], [], "r", animated=True)
+        self.canvas.axes.set_ylim(-1, 1)
+        self.canvas.mpl_connect("draw_event", self.save_live_background)
         self.show()
         self.timer = QTimer()  # live graph timer so that it'll update as data comes in
-        self.timer.setInterval(200)
+        self.timer.setInterval(int(1000 / max(init["live_graph_fps"], 1)))
         self.timer.timeout.connect(self.update_plot)
 
-        self.testTimer = QTimer()
+        # advance the test suite as soon as the reader finishes a test (queued onto the Qt thread)
+        reader.set_done_callback(self.comm.readDone.emit)
+        # limit steps are analysed as the capture comes in
+        reader.set_chunk_listener(self.streamChunk)
+        self.comm.readDone.connect(self.recordData, Qt.QueuedConnection)
 
         # Statuses and buttons
         self.status = "pause"
@@ -131,6 +172,9 @@ class TestRunner(QWidget):
         runbar.addWidget(self.run_test)
         runbar.addWidget(self.stop_test)
         runbar.addWidget(self.pause_graph)
+        self.liveView = QComboBox()
+        self.liveView.addItems(LIVE_VIEWS)
+        runbar.addWidget(self.liveView)
 
         # Sets up device selection widget at the bottom of screen
         deviceTabs = QTabWidget()
@@ -145,7 +189,10 @@ class TestRunner(QWidget):
         topbar.addWidget(toolbar)
         topbar.addLayout(runbar)
         mainGrid.addLayout(topbar)
-        mainGrid.addWidget(self.canvas, 4)
+        self.liveStack = QStackedWidget()
+        self.liveStack.addWidget(self.canvas)
+        self.liveStack.addWidget(self.trace)
+        mainGrid.addWidget(self.liveStack, 4)
         mainGrid.addWidget(deviceTabs, 1)
 
         tabs = QTabWidget()
@@ -159,24 +206,62 @@ class TestRunner(QWidget):
         outerLayout.addLayout(rightPane, 1)
         self.setLayout(outerLayout)
 
+        view = init["live_graph_view"]
+        self.liveView.setCurrentText(view if view in LIVE_VIEWS else LIVE_VIEWS[0])
+        self.set_live_view(self.liveView.currentText())
+        self.liveView.currentTextChanged.connect(self.set_live_view)
+
+    # Shows the live graph on the matplotlib canvas or on the QPainter trace (scrolling or strip chart) and
+    # remembers the choice in init.cfg
+    def set_live_view(self, view):
+        if view == "Matplotlib":
+            self.liveStack.setCurrentWidget(self.canvas)
+        else:
+            self.trace.set_mode("strip" if view == "Trace (strip chart)" else "scroll")
+            self.liveStack.setCurrentWidget(self.trace)
+        self.init["live_graph_view"] = view
+        self.init.sync()
+        self.update_plot()
+
     # Does the computation to graph incoming signal
+    # Only the line is redrawn (blitted over the saved background); the axes are redrawn in full only when the
+    # sample rate changes the time axis or the signal leaves the y range
     def update_plot(self):
-        self.fulldatasize = reader.getCurrDataSize()
-        self.xdata = np.linspace(
-            (self.fulldatasize / reader.sample_rate)
-            - (self.n_data / reader.sample_rate),
-            self.fulldatasize / reader.sample_rate,
-            self.n_data,
-        )
-        self.ydata = reader.getEndArray(self.n_data)
-        if self.xdata.size != len(
-            self.ydata
-        ):  # when there isn't enough data to start graphing yet
-            self.xdata = np.zeros(0)
-            self.ydata = []
-        self.canvas.axes.cla()
-        self.canvas.axes.plot(self.xdata, self.ydata, "r")
-        self.canvas.draw()
+        if self.liveStack.currentWidget() is self.trace:
+            self.trace.update()  # repainted from the reader's buffer on the next paint event
+            return
+        rate = reader.sample_rate
+        if rate != self.liveRate:
+            self.liveRate = rate
+            self.liveX = (np.arange(self.n_data) - (self.n_data - 1)) / rate
+            self.canvas.axes.set_xlim(self.liveX[0], 0)
+            self.canvas.draw()
+        # the count of samples read can be larger than the buffer holds (i.e. a software trigger's ring)
+        ydata = reader.getEndArray(self.n_data)
+        n = ydata.shape[-1]
+        self.liveLine.set_data(self.liveX[self.n_data - n :], ydata)
+        if n > 0:
+            low, high = self.canvas.axes.get_ylim()
+            data_low, data_high = float(np.min(ydata)), float(np.max(ydata))
+            if data_low < low or data_high > high:  # grow the y range (with some headroom)
+                margin = 0.1 * (max(data_high, high) - min(data_low, low))
+                self.canvas.axes.set_ylim(
+                    min(data_low - margin, low), max(data_high + margin, high)
+                )
+                self.canvas.draw()  # draws the line too, see save_live_background
+                return
+        if self.liveBackground is None:
+            self.canvas.draw()
+            return
+        self.canvas.restore_region(self.liveBackground)
+        self.canvas.axes.draw_artist(self.liveLine)
+        self.canvas.blit(self.canvas.axes.bbox)
+
+    # Connected to the canvas draw_event: saves the freshly drawn axes (without the animated line) as the blit
+    # background, then draws the line over them
+    def save_live_background(self, event):
+        self.liveBackground = self.canvas.copy_from_bbox(self.canvas.axes.bbox)
+        self.canvas.axes.draw_artist(self.liveLine)
 
     # is called when play button is clicked
     # runs all of the test in the test suite
@@ -197,6 +282,13 @@ class TestRunner(QWidget):
                 return
             self.results.clear()
             self.testData.clear()
+            self.testChannels.clear()
+            self.testErrors.clear()
+            self.streamResults.clear()
+            self.comm.resultsCleared.emit()
+            self.canvas.axes.set_ylim(-1, 1)  # the live graph's y range grows again from here
+            self.canvas.draw()  # and the saved background has to show the new ticks
+            self.trace.reset_scale()
             self.testsFinished = False
             self.timer.start()  # start live graphing
             self.live_status = "run"
@@ -211,21 +303,7 @@ class TestRunner(QWidget):
             testDict = self.configuredTests[
                 testIndex
             ]  # gets dictionary of the configed test
-            test_duration = testDict[
-                "test_duration"
-            ]  # get specifcally the test duration from test config
-            self.testTimer.setInterval(
-                test_duration * 1000 + 1000
-            )  # timer for test_duration seconds (this is so we can iterate to next test when we finish a test in testsuite)
-            sampleRate = testDict["sample_rate"]  # get the sample rate from config
-            reader.start_reader_thread(
-                sampleRate, test_duration
-            )  # set reader thread with test sample rate
-            generator.start_generator_thread()  # start signal generation thread
-            self.testTimer.timeout.connect(
-                self.recordData
-            )  # call test record data when we finish the above timer
-            self.testTimer.start()  # start the testTimer
+            self.startCapture(testDict)
         # if we are still running the tests in the test suite
         elif self.status == "run" and not self.testsFinished:
             self.timer.start()  # start live graphing
@@ -242,21 +320,33 @@ class TestRunner(QWidget):
             testDict = self.configuredTests[
                 testIndex
             ]  # gets dictionary of the configed test
-            test_duration = testDict[
-                "test_duration"
-            ]  # get specifcally the test duration from test config
-            self.testTimer.setInterval(
-                test_duration * 1000 + 1000
-            )  # timer for test_duration seconds (this is so we can iterate to next test when we finish a test in testsuite) has a 1 second buffer to make sure nidaqmx task closes before text ones starts
-            sampleRate = testDict["sample_rate"]  # get the sample rate from config
-            reader.start_reader_thread(
-                sampleRate, test_duration
-            )  # set reader thread with test sample rate
-
-            self.testTimer.timeout.connect(
-                self.recordData
-            )  # call test record data when we finish the above timer
-            self.testTimer.start()  # start the testTimer
+            if testDict.get("share_capture", False):
+                # this test only analyses a channel of the previous test's capture, nothing to acquire
+                self.sharingCapture = True
+                self.comm.readDone.emit()
+                return
+            self.startCapture(testDict)
+
+    # Starts the stimulus and the reader for one test, recordData is called when the capture completes
+    def startCapture(self, testDict):
+        self.streamer = StreamingAnalyzer(testDict, testDict.get("abort_on_fail", False))
+        self.streamRow = self.getAnalysisRow(testDict, reader.ai_chans)
+        try:
+            start_capture(reader, generator, testDict)
+        except ValueError as e:  # the test can't be run as configured, cancel the suite
+            print("Test suite cancelled:", e)
+            self.stopTest()
+
+    # returns the row of a capture of channels that holds the test's analysis channel
+    def getAnalysisRow(self, testDict, channels):
+        return get_analysis_row(testDict, channels)
+
+    # Called from the reader thread with every block of the capture; stops the capture if abort_on_fail is set
+    # and a streamed step has already failed
+    def streamChunk(self, block):
+        streamer = self.streamer
+        if streamer is not None and not streamer.update(block[self.streamRow]):
+            reader.kill_reader_thread()
 
     # Handles pausing the live graph
     # Is tied to the pause button
@@ -279,46 +369,75 @@ class TestRunner(QWidget):
             self.pause_graph.setText("Pause Live Graph")
 
     # Function: Data collection for a test
+    # Connected to self.comm.readDone, which the reader emits once its acquisition completes
     # Grabs data from the reader and brings it into app
     # Starts next test in test suite
     def recordData(self):
-        self.testTimer.stop()
-        self.testTimer.timeout.disconnect(
-            self.recordData
-        )  # this is done to ensure we don't duplicate the timer (if not done we recursively start timers)
-        self.testData.append(
-            reader.getArray().copy()
-        )  # get the data recorded in reader and put it in testData
+        if self.testsFinished:  # the suite was cancelled, stopTest already cleaned up
+            return
+        testDict = self.configuredTests[self.testList.index(self.testSuite[self.currTest])]
+        if self.sharingCapture:  # reuse the previous test's capture
+            self.sharingCapture = False
+            self.testData.append(self.testData[-1])
+            self.testChannels.append(self.testChannels[-1])
+            self.testErrors.append(self.testErrors[-1])
+            self.streamer = StreamingAnalyzer(testDict)
+            self.streamer.update(
+                self.testData[-1][self.getAnalysisRow(testDict, self.testChannels[-1])]
+            )
+        else:
+            reader.join_reader_thread()  # the read has finished, make sure its task is closed
+            self.testData.append(
+                reader.getArray()
+            )  # get the (channels x samples) data recorded in reader and put it in testData (no copy, the reader allocates a new buffer per test)
+            self.testChannels.append(
+                reader.getReadChannels()
+            )  # names of the channels in each row of the data
+            self.testErrors.append(reader.error)  # i.e. an overrun, the test fails whatever it measured
+        self.streamResults.append(self.streamer)
+        for step in self.streamer.results():
+            print(
+                testDict["name"] + ": " + step["step_name"],
+                "passed" if step["status"] else "failed",
+            )
+        if self.streamer.aborted:
+            print(testDict["name"] + ": capture stopped early, a limit was already failed")
+        if self.testErrors[-1] is not None:
+            print(testDict["name"] + ": capture failed, the test fails:", self.testErrors[-1])
+        self.streamer = None
         reader.clearArray()  # reset the reader read data
         self.currTest += 1  # iterate test index
         if self.currTest == len(self.testSuite):  # if we've completed all tests
             self.testsFinished = True
             self.currTest = 0
             self.comm.testDone.emit()  # emit testsfinished signal
-            # kill reader/generator thread here
-            reader.kill_reader_thread()
+            # kill generator thread here
             generator.kill_generator_thread()
-        else:
-            reader.kill_reader_thread()  # kill reader thread so we can start with next test's sample rate
+            generator.join_generator_thread()
 
         self.runTest()  # call runTest to either start next test or finished test behavior
 
     # Function: Stops the test suite and resets all values
     def stopTest(self):
         try:
-            self.testTimer.stop()  # stop the test timers
-            self.testTimer.timeout.disconnect(
-                self.recordData
-            )  # disconnect the test timer
+            self.testsFinished = True  # reset testing state (recordData ignores the cancelled read)
+            reader.kill_reader_thread()
+            reader.join_reader_thread()
+            generator.kill_generator_thread()
+            generator.join_generator_thread()
             self.testData.clear()  # reset all test data
-            self.testsFinished = True  # reset testing state
+            self.testChannels.clear()
+            self.testErrors.clear()
+            self.streamResults.clear()
+            self.comm.resultsCleared.emit()
+            self.streamer = None
+            peak_cache.clear()  # don't keep the discarded captures alive
+            self.sharingCapture = False
             self.timer.stop()  # stop live graphing
             self.status = "pause"  # reset testing status
             self.currTest = 0  # reset test iterator index
             reader.clearArray()  # clear data in the reader
             self.update_plot()  # reset graph screen to be blank
-            reader.kill_reader_thread()
-            generator.kill_generator_thread()
 
         except:
             print("nothing to stop")
@@ -344,6 +463,8 @@ class DeviceSelect(QWidget):
         self.signalCombo.currentIndexChanged.connect(self.signalComboIndexChanged)
         self.listWidget = QListWidget()
         self.listWidget.setFlow(QListView.LeftToRight)
+        if io == "input":  # several input channels can be read together
+            self.listWidget.setSelectionMode(QAbstractItemView.ExtendedSelection)
         # self.listWidget.setSpacing(1)
         self.listWidget.setStyleSheet(
             "QListWidget::item { border: 1px solid #DEE2E6; background-color: #F8F9FA; } QListWidget::item:selected { background: #0e81dc; }"
@@ -376,10 +497,15 @@ class DeviceSelect(QWidget):
     def signalComboIndexChanged(self):
         generator.set_signal(self.signalCombo.currentText())
 
-    # Changes the channel that the daq either reads or generates on
+    # Changes the channel(s) that the daq either reads or generates on
     def changeChannel(self):
         if self.io == "input":
-            reader.set_ai_channel(self.listWidget.selectedItems()[0].text())
+            # keep the channels in list order so the rows of the captured data are predictable
+            rows = sorted(
+                self.listWidget.row(item) for item in self.listWidget.selectedItems()
+            )
+            if len(rows) > 0:
+                reader.set_ai_channels([self.listWidget.item(r).text() for r in rows])
         else:
             generator.set_ao_channel(self.listWidget.selectedItems()[0].text())
 
@@ -393,6 +519,7 @@ class TestSuite(QWidget):
         self.configuredTests = self.parent().parent().configuredTests
         self.comm = self.parent().parent().comm
         self.comm.testListChanged.connect(self.comboChange)
+        self.comm.testSuiteChanged.connect(self.suiteChange)
 
         self.list_widget = QListWidget(self)
         for t in self.testSuite:
@@ -423,12 +550,22 @@ class TestSuite(QWidget):
         self.pageCombo.addItems(self.testList)
 
     # connected to self.list_widget.model().rowsMoved
+    # (the suite is updated in place, the other tabs and MainWindow share the list)
     def listChange(self):
-        self.testSuite = []
-        for i in range(self.list_widget.count()):
-            self.testSuite.append(self.list_widget.item(i).text())
+        self.testSuite[:] = [
+            self.list_widget.item(i).text() for i in range(self.list_widget.count())
+        ]
         self.comm.testSuiteChanged.emit()
 
+    # connected to self.comm.testSuiteChanged; only rebuilds the list if the suite was changed elsewhere
+    # (i.e. a project was loaded)
+    def suiteChange(self):
+        shown = [self.list_widget.item(i).text() for i in range(self.list_widget.count())]
+        if shown != self.testSuite:
+            self.list_widget.clear()
+            for t in self.testSuite:
+                self.list_widget.addItem(ListWidgetItem(t))
+
     # connected to self.add_test button
     def addTest(self):
         t = self.pageCombo.currentText()
@@ -458,6 +595,7 @@ class TestConfig(QWidget):
         self.pageCombo.setCurrentIndex(-1)
         self.pageCombo.setInsertPolicy(QComboBox.InsertPolicy.InsertAtBottom)
         self.pageCombo.currentIndexChanged.connect(self.comboIndexChanged)
+        self.comm.testListChanged.connect(self.listChange)
         self.name = QLineEdit()
         generalSettingsLabel = QLabel("General Test Settings")
         self.peakState = False
@@ -492,6 +630,39 @@ class TestConfig(QWidget):
         self.testTime = QLineEdit()
         self.sampleRateLabel = QLabel("Sample Rate (hz)")
         self.sampleRate = QLineEdit()
+        self.analysisChannel = QLineEdit()
+        self.analysisChannel.setPlaceholderText("First input channel")
+        self.shareCapture = QCheckBox()
+        self.abortOnFail = QCheckBox()
+        self.synchronized = QCheckBox()
+        self.capturePeriods = QLineEdit()
+        triggerLabel = QLabel("Trigger")
+        self.triggerType = QComboBox()
+        self.triggerType.addItem("None")  # saved as "N/A", recording starts straight away
+        self.triggerType.addItems(["Analog Edge", "Digital Edge", "Software"])
+        self.triggerSource = QLineEdit()
+        self.triggerSource.setPlaceholderText("First input channel (digital triggers need a terminal)")
+        self.triggerLevel = QLineEdit()
+        self.triggerSlope = QComboBox()
+        self.triggerSlope.addItems(["Rising", "Falling"])
+        self.pretriggerTime = QLineEdit()
+        self.triggerTimeout = QLineEdit()
+        self.triggerTimeout.setPlaceholderText("10")
+        stimulusLabel = QLabel("Stimulus")
+        self.signalShape = QComboBox()
+        self.signalShape.addItem("Default")  # saved as "N/A", uses the signal chosen in the Output tab
+        self.signalShape.addItems(generator.get_signals())
+        self.signalFrequency = QLineEdit()
+        self.signalAmplitude = QLineEdit()
+        self.signalOffset = QLineEdit()
+        self.signalDutyCycle = QLineEdit()
+        self.signalSampleRate = QLineEdit()
+        self.signalFile = QLineEdit()
+        self.browse_signal_file = QPushButton("Browse")
+        self.browse_signal_file.pressed.connect(self.browseSignalFile)
+        signalFileLayout = QHBoxLayout()
+        signalFileLayout.addWidget(self.signalFile)
+        signalFileLayout.addWidget(self.browse_signal_file)
         self.clear_test = QPushButton("Clear")
         self.save_test = QPushButton("Save")
         self.delete_test = QPushButton("Delete")
@@ -541,6 +712,28 @@ class TestConfig(QWidget):
         form.addRow("Test Time (s)", self.testTime)
         form.addRow(self.sampleRateLabel)
         form.addRow("Sample Rate (hz)", self.sampleRate)
+        form.addRow("Analysis Channel", self.analysisChannel)
+        form.addRow("Share Previous Capture", self.shareCapture)
+        form.addRow("Stop Capture on Failed Limit", self.abortOnFail)
+        form.addRow(QHLine())
+        form.addRow(triggerLabel)
+        form.addRow("Type", self.triggerType)
+        form.addRow("Source", self.triggerSource)
+        form.addRow("Level (V)", self.triggerLevel)
+        form.addRow("Slope", self.triggerSlope)
+        form.addRow("Pre-trigger Time (s)", self.pretriggerTime)
+        form.addRow("Timeout (s)", self.triggerTimeout)
+        form.addRow(QHLine())
+        form.addRow(stimulusLabel)
+        form.addRow("Shape", self.signalShape)
+        form.addRow("Frequency (hz)", self.signalFrequency)
+        form.addRow("Amplitude (V)", self.signalAmplitude)
+        form.addRow("Offset (V)", self.signalOffset)
+        form.addRow("Duty Cycle (%)", self.signalDutyCycle)
+        form.addRow("Sample Rate (hz)", self.signalSampleRate)
+        form.addRow("Waveform File", signalFileLayout)
+        form.addRow("Synchronize Capture", self.synchronized)
+        form.addRow("Capture Periods", self.capturePeriods)
         form.addRow(self.clear_test)
         button_layout = QHBoxLayout()
         button_layout.addWidget(self.save_test)
@@ -563,9 +756,9 @@ class TestConfig(QWidget):
         rightPane.addWidget(self.scroll)
         self.setLayout(rightPane)
 
-    # return as a string after checking if input is N/A
+    # return as a string after checking if input is N/A (settings added after the config was saved count as N/A)
     def checkNA(self, lineEdit, i, name):
-        text = str(self.configuredTests[i][name])
+        text = str(self.configuredTests[i].get(name, "N/A"))
         # if
         if text != "N/A":
             lineEdit.setText(text)
@@ -573,6 +766,23 @@ class TestConfig(QWidget):
             lineEdit.clear()
 
     # set the QLabels to the parameters of the selected test when the combo selection changes
+    # connected to self.comm.testListChanged
+    # Rebuilds the test picker if the tests were changed elsewhere (i.e. a project was loaded), otherwise
+    # reloads the form of the selected test in case its configuration changed
+    def listChange(self):
+        shown = [self.pageCombo.itemText(i) for i in range(self.pageCombo.count())]
+        if shown == self.testList:
+            if self.pageCombo.currentIndex() != -1:
+                self.comboIndexChanged(self.pageCombo.currentIndex())
+            return
+        self.pageCombo.blockSignals(True)
+        self.pageCombo.clear()
+        self.pageCombo.addItems(self.testList)
+        self.pageCombo.setCurrentIndex(-1)
+        self.pageCombo.blockSignals(False)
+        self.name.clear()
+        self.clearTest()
+
     def comboIndexChanged(self, i):
         self.name.setText(self.configuredTests[i]["name"])
         if self.configuredTests[i]["find_peaks"]:
@@ -599,6 +809,26 @@ class TestConfig(QWidget):
         self.checkNA(self.avgFallTimeMaxTol, i, "avg_fall_max_tol")
         self.checkNA(self.testTime, i, "test_duration")
         self.checkNA(self.sampleRate, i, "sample_rate")
+        self.checkNA(self.analysisChannel, i, "analysis_channel")
+        self.shareCapture.setChecked(self.configuredTests[i].get("share_capture", False))
+        self.abortOnFail.setChecked(self.configuredTests[i].get("abort_on_fail", False))
+        trigger_type = self.configuredTests[i].get("trigger_type", "N/A")
+        self.triggerType.setCurrentIndex(max(self.triggerType.findText(trigger_type), 0))
+        self.checkNA(self.triggerSource, i, "trigger_source")
+        self.checkNA(self.triggerLevel, i, "trigger_level")
+        self.triggerSlope.setCurrentText(self.configuredTests[i].get("trigger_slope", "Rising"))
+        self.checkNA(self.pretriggerTime, i, "pretrigger_time")
+        self.checkNA(self.triggerTimeout, i, "trigger_timeout")
+        shape = self.configuredTests[i].get("signal_shape", "N/A")
+        self.signalShape.setCurrentIndex(max(self.signalShape.findText(shape), 0))
+        self.checkNA(self.signalFrequency, i, "signal_frequency")
+        self.checkNA(self.signalAmplitude, i, "signal_amplitude")
+        self.checkNA(self.signalOffset, i, "signal_offset")
+        self.checkNA(self.signalDutyCycle, i, "signal_duty_cycle")
+        self.checkNA(self.signalSampleRate, i, "signal_sample_rate")
+        self.checkNA(self.signalFile, i, "signal_file")
+        self.synchronized.setChecked(self.configuredTests[i].get("synchronized", False))
+        self.checkNA(self.capturePeriods, i, "capture_periods")
 
     # Connected to self.clear_test button; clears text from the QLabels
     def clearTest(self):
@@ -625,6 +855,35 @@ class TestConfig(QWidget):
         self.avgFallTimeMaxTol.clear()
         self.testTime.clear()
         self.sampleRate.clear()
+        self.analysisChannel.clear()
+        self.shareCapture.setChecked(False)
+        self.abortOnFail.setChecked(False)
+        self.triggerType.setCurrentIndex(0)
+        self.triggerSource.clear()
+        self.triggerLevel.clear()
+        self.triggerSlope.setCurrentIndex(0)
+        self.pretriggerTime.clear()
+        self.triggerTimeout.clear()
+        self.signalShape.setCurrentIndex(0)
+        self.signalFrequency.clear()
+        self.signalAmplitude.clear()
+        self.signalOffset.clear()
+        self.signalDutyCycle.clear()
+        self.signalSampleRate.clear()
+        self.signalFile.clear()
+        self.synchronized.setChecked(False)
+        self.capturePeriods.clear()
+
+    # Connected to self.browse_signal_file button; chooses a .csv/.npy file holding one period of a waveform
+    def browseSignalFile(self):
+        dialog = QFileDialog(self)
+        dialog.setFileMode(QFileDialog.ExistingFile)
+        dialog.setViewMode(QFileDialog.Detail)
+        dialog.setNameFilter("Waveforms (*.csv *.npy)")
+        dialog.setAcceptMode(QFileDialog.AcceptOpen)
+        if dialog.exec():
+            self.signalFile.setText(dialog.selectedFiles()[0])
+            self.signalShape.setCurrentText("File")
 
     # returns an int or "N/A"
     def validateInt(self, text):
@@ -676,6 +935,40 @@ class TestConfig(QWidget):
         newDict["avg_fall_max_tol"] = self.validateFloat(self.avgFallTimeMaxTol.text())
         newDict["test_duration"] = self.validateFloat(self.testTime.text())
         newDict["sample_rate"] = self.validateFloat(self.sampleRate.text())
+        newDict["analysis_channel"] = (
+            self.analysisChannel.text() if self.analysisChannel.text() != "" else "N/A"
+        )
+        newDict["share_capture"] = bool(self.shareCapture.checkState())
+        newDict["abort_on_fail"] = bool(self.abortOnFail.checkState())
+        newDict["trigger_type"] = (
+            self.triggerType.currentText()
+            if self.triggerType.currentIndex() > 0
+            else "N/A"
+        )
+        newDict["trigger_source"] = (
+            self.triggerSource.text() if self.triggerSource.text() != "" else "N/A"
+        )
+        newDict["trigger_level"] = self.validateFloat(self.triggerLevel.text())
+        newDict["trigger_slope"] = self.triggerSlope.currentText()
+        newDict["pretrigger_time"] = self.validateFloat(self.pretriggerTime.text())
+        newDict["trigger_timeout"] = self.validateFloat(self.triggerTimeout.text())
+        newDict["signal_shape"] = (
+            self.signalShape.currentText()
+            if self.signalShape.currentIndex() > 0
+            else "N/A"
+        )
+        newDict["signal_frequency"] = self.validateFloat(self.signalFrequency.text())
+        newDict["signal_amplitude"] = self.validateFloat(self.signalAmplitude.text())
+        newDict["signal_offset"] = self.validateFloat(self.signalOffset.text())
+        newDict["signal_duty_cycle"] = self.validateFloat(self.signalDutyCycle.text())
+        newDict["signal_sample_rate"] = self.validateFloat(
+            self.signalSampleRate.text()
+        )
+        newDict["signal_file"] = (
+            self.signalFile.text() if self.signalFile.text() != "" else "N/A"
+        )
+        newDict["synchronized"] = bool(self.synchronized.checkState())
+        newDict["capture_periods"] = self.validateFloat(self.capturePeriods.text())
         if test_index == -1:
             self.testList.append(testName)
             self.configuredTests.append(newDict)
@@ -709,6 +1002,9 @@ class Analysis(QWidget):
         toolbar = NavigationToolbar(self.canvas, self)
         self.testSuite = self.parent().testSuite
         self.testData = self.parent().testData
+        self.testChannels = self.parent().testChannels
+        self.testErrors = self.parent().testErrors
+        self.streamResults = self.parent().streamResults
         self.comm = self.parent().comm
         self.configuredTests = self.parent().configuredTests
         # List of dicts to store the results for each test
@@ -716,6 +1012,32 @@ class Analysis(QWidget):
         # which contains a list of dicts where each dict is the results for a specific step.
         # The format of the internal step dict can be found in signal_analysis.py
         self.results = self.parent().results
+        # step results of each test in the suite, stepResults[suite index][step index], filled in by
+        # updateResults so browsing the steps only redraws the graph and never re-analyses a capture
+        self.stepResults = {}
+        # min/max decimation pyramid of the analysed channel of each test in the suite, by suite index, so the
+        # graph only draws about two points per pixel whatever the capture length and zoom level
+        self.pyramids = {}
+        self.tracePyramid = None  # pyramid and line of the capture in the graph
+        self.traceLine = None
+        self.shownTest = None  # suite index of the capture in the graph
+        # suite index -> (xlim, ylim, figure bounds, saved region) of the graph drawn without the markings
+        self.backgrounds = {}
+        # animated markings of the step shown (blitted over the background) and what they were made from
+        self.overlays = []
+        self.peakLabels = []
+        self.overlayStep = None
+        self.overlayData = None
+        self.labelledPeaks = np.zeros(0, dtype=np.int64)
+        self.canvas.mpl_connect("draw_event", self.saveResultsBackground)
+        self.analysisRun = 0  # counts suites sent for analysis, results of an older run are dropped
+        self.analysisPending = 0  # tests of the current run still being analysed
+        self.analysisFutures = []  # pool futures of the current run, cancelled if its results are dropped
+        self.analysisProgress = QProgressBar()
+        self.analysisProgress.setFormat("Analysing tests: %v/%m")
+        self.analysisProgress.hide()
+        self.comm.stepsReady.connect(self.storeResults, Qt.QueuedConnection)
+        self.comm.resultsCleared.connect(self.cancelAnalysis)
         # keeps track of which step graph to display
         self.step_index = 0
         self.step_right_button = QPushButton("Next Step")
@@ -745,6 +1067,7 @@ class Analysis(QWidget):
         buttonLayout.addWidget(self.step_right_button)
         buttonLayout.addStretch()
         resultsPane.addLayout(buttonLayout)
+        resultsPane.addWidget(self.analysisProgress)
         resultsPane.addWidget(self.canvas)
 
         tabs = QTabWidget()
@@ -766,10 +1089,7 @@ class Analysis(QWidget):
     def step_right(self):
         # Grabbing various information in order to get the list of steps
         current_test = self.list_widget.selectedItems()[0].text()
-        index = self.testSuite.index(current_test)
-        data = self.testData[index]
-        params = self.getTestParams(current_test)
-        step_list = self.getStepList(data, params)
+        step_list = self.getSteps(self.testSuite.index(current_test))
         # Bounds checking to make sure the step_index doesn't go beyond the
         # testSuite length. Disables right_button when the end is reached and
         # re-enables the left_button if the step_index is incremented past zero
@@ -787,10 +1107,7 @@ class Analysis(QWidget):
     def step_left(self):
         # Grabbing various information in order to get the list of steps
         current_test = self.list_widget.selectedItems()[0].text()
-        index = self.testSuite.index(current_test)
-        data = self.testData[index]
-        params = self.getTestParams(current_test)
-        step_list = self.getStepList(data, params)
+        step_list = self.getSteps(self.testSuite.index(current_test))
         # Bounds checking to make sure the step_index doesn't go beyond the
         # testSuite. Disables the left_button when step_index becomes zero and
         # re-enables the right_button if the step_index is decremented below
@@ -806,10 +1123,22 @@ class Analysis(QWidget):
     # Updates the list of tests in the analysis tab whenever the testSuite is changed
     # Should be attached to the testSuiteChanged signal in the comm class
     def listChange(self):
+        self.cancelAnalysis()  # the pending tests' suite indices no longer line up either
+        self.stepResults.clear()  # suite indices no longer line up with the stored results
+        self.pyramids.clear()
+        self.backgrounds.clear()
+        # clearing a selected list would run list_click_helper against the new suite
+        self.list_widget.blockSignals(True)
         self.list_widget.clear()
         for t in self.testSuite:
             item = ListWidgetItem(t)
             self.list_widget.addItem(item)
+        self.list_widget.blockSignals(False)
+        # the graph and step view showed a capture of the old suite
+        self.step_index = 0
+        self.step_left_button.setEnabled(False)
+        self.step_right_button.setEnabled(False)
+        self.clearResultsGraph()
 
     # Gets the parameters of a specified test in configuredTests
     def getTestParams(self, test_name):
@@ -819,88 +1148,31 @@ class Analysis(QWidget):
                 return test
             # print(test)
 
-    # Returns a list of dicts where each dict is the results of a step in a test
-    # The steps in the test are determined by which fields in the test configuration
-    # are not set to "N/A"
+    # Returns the samples of the channel a test's analysis steps are bound to ("analysis_channel")
+    # from the test's (channels x samples) capture; the first channel if the test doesn't set one
+    def getTestData(self, index, params):
+        channels = self.testChannels[index]
+        channel = params.get("analysis_channel", "N/A")
+        if channel == "N/A":
+            return self.testData[index][0]
+        if channel not in channels:
+            print(channel, "was not captured, analysing", channels[0], "instead")
+            return self.testData[index][0]
+        return self.testData[index][channels.index(channel)]
+
+    # Returns a list of dicts where each dict is the results of a step in a test (see get_step_list)
     def getStepList(self, data, params):
-        step_list = []
-        if params["min_sig"] != "N/A" and params["max_sig"] != "N/A":
-            step_list.append(
-                analyzer.min_max_signal(data, params["min_sig"], params["max_sig"])
-            )
-        if params["avg_sig_min_tol"] != "N/A" and params["avg_sig_max_tol"] != "N/A":
-            step_list.append(
-                analyzer.avg_signal(
-                    data, params["avg_sig_min_tol"], params["avg_sig_max_tol"]
-                )
-            )
-        if (
-            params["rise_start_percent"] != "N/A"
-            and params["rise_end_percent"] != "N/A"
-            and params["rise_time_min_tol"] != "N/A"
-            and params["rise_time_max_tol"] != "N/A"
-        ):
-            step_list.append(
-                analyzer.rise_time_all_peaks(
-                    data,
-                    params["rise_start_percent"],
-                    params["rise_end_percent"],
-                    params["rise_time_min_tol"],
-                    params["rise_time_max_tol"],
-                    params["sample_rate"],
-                )
-            )
-        if (
-            params["fall_start_percent"] != "N/A"
-            and params["fall_end_percent"] != "N/A"
-            and params["fall_time_min_tol"] != "N/A"
-            and params["fall_time_max_tol"] != "N/A"
-        ):
-            step_list.append(
-                analyzer.fall_time_all_peaks(
-                    data,
-                    params["fall_start_percent"],
-                    params["fall_end_percent"],
-                    params["fall_time_min_tol"],
-                    params["fall_time_max_tol"],
-                    params["sample_rate"],
-                )
-            )
-        if (
-            params["avg_rise_min_tol"] != "N/A"
-            and params["avg_rise_max_tol"] != "N/A"
-            and params["avg_rise_start_percent"] != "N/A"
-            and params["avg_rise_end_percent"] != "N/A"
-        ):
-            step_list.append(
-                analyzer.avg_rise_time(
-                    data,
-                    params["avg_rise_start_percent"],
-                    params["avg_rise_end_percent"],
-                    params["avg_rise_min_tol"],
-                    params["avg_rise_max_tol"],
-                    params["sample_rate"],
-                )
-            )
-        if (
-            params["avg_fall_min_tol"] != "N/A"
-            and params["avg_fall_max_tol"] != "N/A"
-            and params["avg_fall_start_percent"] != "N/A"
-            and params["avg_fall_end_percent"] != "N/A"
-        ):
-            step_list.append(
-                analyzer.avg_fall_time(
-                    data,
-                    params["avg_fall_start_percent"],
-                    params["avg_fall_end_percent"],
-                    params["avg_fall_min_tol"],
-                    params["avg_fall_max_tol"],
-                    params["sample_rate"],
-                )
-            )
-        if params["find_peaks"]:
-            step_list.append(analyzer.find_peaks(data))
-        return step_list
+        return get_step_list(data, params)
+
+    # Returns the step results of the test at index in the test suite
+    # They are stored by updateResults; a test without stored results (i.e. one selected before the suite
+    # finished) is analysed once here
+    def getSteps(self, index):
+        if index not in self.stepResults:
+            params = self.getTestParams(self.testSuite[index])
+            data = self.getTestData(index, params)
+            self.stepResults[index] = self.getStepList(data, params)
+        return self.stepResults[index]
 
     # Updates self.results with the results from the running of the testSuite.
     # self.results consists of a list of dicts where each dict represents a test
@@ -909,184 +1181,296 @@ class Analysis(QWidget):
     # test_passed: a boolean showing if the test passed or not. A test fails if any step within that test fails
     # results: a list of dicts where each dict is the results of an individual step. Refer to signal_analysis.py
     # for the structure of the step results dict
+    # aborted: only set (to True) if the capture was stopped early because a limit had already failed
+    # error: only set if the capture ended with an acquisition error (i.e. a buffer overrun), the test then fails
+    # Each test is analysed in analysis_pool; its entry is filled in by storeResults when it completes and
+    # analysisDone is emitted once they all have
     def updateResults(self):
+        self.cancelAnalysis()
+        self.stepResults.clear()
+        self.pyramids.clear()
+        self.backgrounds.clear()
+        self.shownTest = None
+        self.results.clear()
+        self.analysisPending = len(self.testSuite)
+        self.analysisProgress.setRange(0, self.analysisPending)
+        self.analysisProgress.setValue(0)
+        self.analysisProgress.show()
         for i in range(len(self.testSuite)):
             test_name = self.testSuite[i]
             # print(test_name)
             index = self.testSuite.index(test_name)
-            data = self.testData[index]
             params = self.getTestParams(test_name)
+            data = self.getTestData(index, params)
             self.results.append(
                 {"test_name": test_name, "test_passed": True, "results": []}
             )
-            step_list = self.getStepList(data, params)
-            for step in step_list:
-                self.results[i]["results"].append(step)
-                if step["status"] == False:
-                    self.results[i]["test_passed"] = False
+            future = analysis_pool.submit(data, params)
+            self.analysisFutures.append(future)
+            future.add_done_callback(
+                functools.partial(self.comm.stepsReady.emit, self.analysisRun, i)
+            )
+        if self.analysisPending == 0:
+            self.finishAnalysis()
+
+    # Stores the step results of the test at suite index i of analysis run, once the pool has analysed it
+    def storeResults(self, run, i, future):
+        if run != self.analysisRun:  # a newer suite has finished since
+            return
+        try:
+            try:
+                step_list = future.result()
+            except Exception as e:  # i.e. the worker process died, analyse the test here instead
+                print("Analysis of", self.testSuite[i], "failed in the pool:", e)
+                params = self.getTestParams(self.testSuite[i])
+                index = self.testSuite.index(self.testSuite[i])
+                step_list = self.getStepList(self.getTestData(index, params), params)
+            self.stepResults[i] = step_list
+            self.results[i] = test_results(
+                self.testSuite[i], step_list, self.streamResults[i], self.testErrors[i]
+            )
+        except Exception as e:  # the test can't be analysed at all, it fails with the error
+            print("Analysis of", self.testSuite[i], "failed:", e)
+            self.stepResults[i] = []
+            self.results[i] = {
+                "test_name": self.testSuite[i], "test_passed": False, "results": [], "error": str(e)
+            }
+        finally:  # the run always completes, so analysisDone is emitted even if a test failed to analyse
+            self.analysisPending -= 1
+            self.analysisProgress.setValue(self.analysisProgress.maximum() - self.analysisPending)
+            if self.analysisPending == 0:
+                self.finishAnalysis()
+
+    def finishAnalysis(self):
+        self.analysisFutures.clear()
+        self.analysisProgress.hide()
+        self.comm.analysisDone.emit()
+
+    # Drops the analysis still running: its futures are cancelled and storeResults ignores those that
+    # complete anyway, so a previous suite's steps never land in the results of the next one
+    def cancelAnalysis(self):
+        self.analysisRun += 1
+        for future in self.analysisFutures:
+            future.cancel()
+        self.analysisFutures.clear()
+        self.analysisPending = 0
+        self.analysisProgress.hide()
 
     # Updates the graph in the results pane with the data for the test that is currently clicked on
     # Depending on what step is currently selected, different markings are put on the graph to better display the results
+    # The capture is drawn once per test and saved as the background (see saveResultsBackground); the markings
+    # are animated overlay artists, so switching steps only swaps them and blits them over the background
     def updateResultsGraph(self):
         current_test = self.list_widget.selectedItems()[0].text()
         # print(current_test)
         index = self.testSuite.index(current_test)
-        data = self.testData[index]
         params = self.getTestParams(current_test)
-        self.canvas.axes.clear()
-        self.canvas.axes.plot(data)
-        step_list = self.getStepList(data, params)
+        data = self.getTestData(index, params)
+        step_list = self.getSteps(index)
         current_step = step_list[self.step_index]
-        peak_info = analyzer.find_peaks(data)["measurement"]
-        min_peak_len = min(len(peak_info[0]), len(peak_info[1]), len(peak_info[2]))
+        for artist in self.overlays + self.peakLabels:
+            artist.remove()
+        self.overlays = []
+        self.peakLabels = []
+        self.overlayStep = current_step
+        self.overlayData = data
+        if index != self.shownTest:
+            self.showTrace(index, data, step_list)
+        axes = self.canvas.axes
+        _, _, left, top, right = peak_features(data)  # cached, the steps already found them
+        # the edges the rise and fall time steps measured, in the order of their measurements
+        starts, rise_peaks = rising_edges(left, top)
+        fall_peaks, ends = falling_edges(top, right)
 
         # The user defined limits for maximum and minimum are shown with a dashed line
         # If the maximum line is below the maximum limit, it is displayed in green, otherwise red
         # If the minimum line is above the minimum limit, it is displayed in green, otherwise red
         # Both the recorded minimum and maximum are labeled with text
         if current_step["step_name"] == "min_max_signal":
-            self.canvas.axes.set_title("Minimum/MaximumSignal")
+            axes.set_title("Minimum/MaximumSignal")
             min_sig = current_step["measurement"][0]
             max_sig = current_step["measurement"][1]
             min_tol = current_step["low_limit"]
             max_tol = current_step["high_limit"]
-            if min_sig < min_tol:
-                self.canvas.axes.axhline(y=min_sig, color="r", linestyle="-")
-            else:
-                self.canvas.axes.axhline(y=min_sig, color="g", linestyle="-")
-            self.canvas.axes.text(0, min_sig, "Minimum Signal")
-            if max_sig > max_tol:
-                self.canvas.axes.axhline(y=max_sig, color="r", linestyle="-")
-            else:
-                self.canvas.axes.axhline(y=max_sig, color="g", linestyle="-")
-            self.canvas.axes.text(0, max_sig, "Maximum Signal")
-            self.canvas.axes.axhline(y=min_tol, color="b", linestyle="dashed")
-            self.canvas.axes.axhline(y=max_tol, color="b", linestyle="dashed")
+            self.overlays += [
+                axes.axhline(y=min_sig, color="r" if min_sig < min_tol else "g", linestyle="-"),
+                axes.text(0, min_sig, "Minimum Signal"),
+                axes.axhline(y=max_sig, color="r" if max_sig > max_tol else "g", linestyle="-"),
+                axes.text(0, max_sig, "Maximum Signal"),
+                axes.axhline(y=min_tol, color="b", linestyle="dashed"),
+                axes.axhline(y=max_tol, color="b", linestyle="dashed"),
+            ]
 
         # The user defined maximum and minimum tolerances are displayed with dashed lines
         # If the average signal is within the limits, it is displayed as a green line, otherwise red
         if current_step["step_name"] == "average_signal":
-            self.canvas.axes.set_title("Average Signal")
-            if current_step["status"]:
-                self.canvas.axes.axhline(
-                    y=current_step["measurement"], color="g", linestyle="-"
-                )
-            else:
-                self.canvas.axes.axhline(
-                    y=current_step["measurement"], color="r", linestyle="-"
-                )
-            self.canvas.axes.axhline(
-                y=params["avg_sig_min_tol"], color="b", linestyle="dashed"
-            )
-            self.canvas.axes.axhline(
-                y=params["avg_sig_max_tol"], color="b", linestyle="dashed"
-            )
-        # The peaks are labeled with black dots and the beginning prominence is labeled with green dots
-        # The rise time for each peak is labeled above the peak with text
+            axes.set_title("Average Signal")
+            self.overlays += [
+                axes.axhline(
+                    y=current_step["measurement"],
+                    color="g" if current_step["status"] else "r",
+                    linestyle="-",
+                ),
+                axes.axhline(y=params["avg_sig_min_tol"], color="b", linestyle="dashed"),
+                axes.axhline(y=params["avg_sig_max_tol"], color="b", linestyle="dashed"),
+            ]
+        # The peaks are labeled with blue dots and the beginning prominence is labeled with green dots
+        # The rise time for each peak is labeled above the peak with text (see labelPeaks)
         if current_step["step_name"] == "rise_time_peak":
-            self.canvas.axes.set_title("Rise Time for Peak")
-            for i in range(min_peak_len - 1):
-                self.canvas.axes.plot(
-                    peak_info[0][i],
-                    data[peak_info[0][i]],
-                    ".",
-                    color="g",
-                    markersize=20,
-                )
-                self.canvas.axes.plot(
-                    peak_info[1][i],
-                    data[peak_info[1][i]],
-                    ".",
-                    color="b",
-                    markersize=20,
-                )
-                self.canvas.axes.text(
-                    peak_info[1][i],
-                    data[peak_info[1][i]],
-                    str(current_step["measurement"][i]),
-                )
-        # The peaks are labeled with black dots and the ending prominence is labeled with red dots
-        # The fall time for each peak is labeled above the peak with text
+            axes.set_title("Rise Time for Peak")
+            self.overlays += [
+                self.markPoints(data, starts, ".", "g", 20),
+                self.markPoints(data, rise_peaks, ".", "b", 20),
+            ]
+            self.labelledPeaks = rise_peaks
+        # The peaks are labeled with blue dots and the ending prominence is labeled with red dots
+        # The fall time for each peak is labeled above the peak with text (see labelPeaks)
         if current_step["step_name"] == "fall_time_peak":
-            self.canvas.axes.set_title("Fall Time for Peak")
-            for i in range(min_peak_len - 1):
-                self.canvas.axes.plot(
-                    peak_info[2][i],
-                    data[peak_info[2][i]],
-                    ".",
-                    color="r",
-                    markersize=20,
-                )
-                self.canvas.axes.plot(
-                    peak_info[1][i],
-                    data[peak_info[1][i]],
-                    ".",
-                    color="b",
-                    markersize=20,
-                )
-                self.canvas.axes.text(
-                    peak_info[1][i],
-                    data[peak_info[1][i]],
-                    str(current_step["measurement"][i]),
-                )
-        # The peaks are labeled with black dots and the beginning prominence is labeled with green dots
-        # The average rise time is labeled in the graph title
+            axes.set_title("Fall Time for Peak")
+            self.overlays += [
+                self.markPoints(data, ends, ".", "r", 20),
+                self.markPoints(data, fall_peaks, ".", "b", 20),
+            ]
+            self.labelledPeaks = fall_peaks
+        # The peaks are labeled with blue dots and the beginning prominence is labeled with green dots
+        # The average rise time is labeled in the top right corner
         if current_step["step_name"] == "avg_rise_time":
-            self.canvas.axes.set_title("Average Rise Time")
-            for i in range(min_peak_len - 1):
-                self.canvas.axes.plot(
-                    peak_info[0][i],
-                    data[peak_info[0][i]],
-                    ".",
-                    color="g",
-                    markersize=20,
-                )
-                self.canvas.axes.plot(
-                    peak_info[1][i],
-                    data[peak_info[1][i]],
-                    ".",
-                    color="b",
-                    markersize=20,
-                )
-                self.canvas.axes.text(
+            axes.set_title("Average Rise Time")
+            self.overlays += [
+                self.markPoints(data, starts, ".", "g", 20),
+                self.markPoints(data, rise_peaks, ".", "b", 20),
+                axes.text(
                     1,
                     1,
                     ("Average Rise Time: " + str(current_step["measurement"])),
-                    transform=self.canvas.axes.transAxes,
-                )
-        # The peaks are labeled with black dots and the ending prominence is labeled with red dots
-        # The average rise time is labeled in the graph title
+                    transform=axes.transAxes,
+                ),
+            ]
+        # The peaks are labeled with blue dots and the ending prominence is labeled with red dots
+        # The average fall time is labeled in the top right corner
         if current_step["step_name"] == "avg_fall_time":
-            self.canvas.axes.set_title("Average Fall Time")
-            for i in range(min_peak_len - 1):
-                self.canvas.axes.plot(
-                    peak_info[1][i],
-                    data[peak_info[1][i]],
-                    ".",
-                    color="b",
-                    markersize=20,
-                )
-                self.canvas.axes.plot(
-                    peak_info[2][i],
-                    data[peak_info[2][i]],
-                    ".",
-                    color="r",
-                    markersize=20,
-                )
-                self.canvas.axes.text(
+            axes.set_title("Average Fall Time")
+            self.overlays += [
+                self.markPoints(data, fall_peaks, ".", "b", 20),
+                self.markPoints(data, ends, ".", "r", 20),
+                axes.text(
                     1,
                     1,
                     ("Average Fall Time: " + str(current_step["measurement"])),
-                    transform=self.canvas.axes.transAxes,
-                )
-        # Peaks are labeled with an x. The color is randomized
+                    transform=axes.transAxes,
+                ),
+            ]
+        # Peaks are labeled with an x. Each peak takes the next colour of the colour cycle
         # (this was initially unintended behavior, but I thought it looked pretty)
         if current_step["step_name"] == "find_peaks":
-            self.canvas.axes.set_title("Find Peaks")
-            for peak in peak_info[1]:
-                self.canvas.axes.plot(peak, data[peak], "x")
+            axes.set_title("Find Peaks")
+            colors = ["C" + str((i + 1) % 10) for i in range(len(top))]
+            self.overlays.append(self.markPoints(data, top, "x", colors, 6))
+
+        for artist in self.overlays:
+            artist.set_animated(True)
+        self.labelPeaks()
+        self.blitOverlays()
+
+    # Returns one scatter marking data at the sample indices points, sized like a plot marker of markersize
+    def markPoints(self, data, points, marker, color, markersize):
+        return self.canvas.axes.scatter(
+            points, data[points], s=markersize**2, marker=marker, c=color, linewidths=1.5
+        )
 
-        self.canvas.draw()
+    # Draws the capture of the test at suite index into a cleared graph, and its background unless the one
+    # saved for the test still matches the graph
+    # The axes limits are fixed here (wide enough for every step's lines) so swapping overlays never
+    # rescales the graph
+    def showTrace(self, index, data, step_list):
+        axes = self.canvas.axes
+        axes.clear()
+        axes.title.set_animated(True)  # the title changes with the step, so it is drawn with the overlays
+        self.shownTest = index
+        if index not in self.pyramids:
+            self.pyramids[index] = MinMaxPyramid(data)
+        self.tracePyramid = self.pyramids[index]
+        x, y = self.tracePyramid.query(0, len(data), self.canvas.width())
+        (self.traceLine,) = axes.plot(x, y)
+        low, high = axes.get_ylim()
+        levels = [
+            value
+            for step in step_list
+            if step["step_name"] in ("min_max_signal", "average_signal")
+            for value in np.hstack([step["measurement"], step["low_limit"], step["high_limit"]])
+            if np.isfinite(value)
+        ]
+        if levels and (min(levels) < low or max(levels) > high):
+            low, high = min(low, min(levels)), max(high, max(levels))
+            margin = 0.05 * (high - low)
+            low, high = low - margin, high + margin
+        axes.set_ylim(low, high)
+        axes.set_xlim(axes.get_xlim())
+        # clear() drops the axes callbacks, so reconnect the refinement for zooming and panning
+        axes.callbacks.connect("xlim_changed", self.refineTrace)
+        saved = self.backgrounds.get(index)
+        if saved is None or saved[:3] != self.graphView():
+            self.canvas.draw()  # saveResultsBackground keeps the new background
+
+    # returns what a saved background depends on: the axes limits and the size of the figure
+    def graphView(self):
+        axes = self.canvas.axes
+        return axes.get_xlim(), axes.get_ylim(), tuple(self.canvas.figure.bbox.bounds)
+
+    # Labels the peaks measured by a rise/fall time step with their times, for the peaks in view only and none
+    # when there are more than max_labels of them (zoom in to see them), so a capture with thousands of peaks
+    # doesn't get thousands of text artists
+    def labelPeaks(self, max_labels=50):
+        for artist in self.peakLabels:
+            artist.remove()
+        self.peakLabels = []
+        step = self.overlayStep
+        if step is None or step["step_name"] not in ("rise_time_peak", "fall_time_peak"):
+            return
+        start, end = self.canvas.axes.get_xlim()
+        peaks = self.labelledPeaks[: len(step["measurement"])]
+        shown = np.flatnonzero((peaks >= start) & (peaks <= end))
+        if len(shown) > max_labels:
+            return
+        for i in shown:
+            label = self.canvas.axes.text(
+                peaks[i], self.overlayData[peaks[i]], str(step["measurement"][i])
+            )
+            label.set_animated(True)
+            self.peakLabels.append(label)
+
+    # Connected to the canvas draw_event: saves the freshly drawn graph (the capture without the step's
+    # markings) as the shown test's background, then draws the markings over it
+    def saveResultsBackground(self, event):
+        if self.shownTest is None:
+            return
+        self.backgrounds[self.shownTest] = self.graphView() + (
+            self.canvas.copy_from_bbox(self.canvas.figure.bbox),
+        )
+        self.labelPeaks()  # the view may have changed
+        self.drawOverlays()
+
+    def drawOverlays(self):
+        self.canvas.figure.draw_artist(self.canvas.axes.title)
+        for artist in self.overlays + self.peakLabels:
+            self.canvas.figure.draw_artist(artist)
+
+    # Puts the current step's markings on the graph by restoring the background and blitting them over it
+    def blitOverlays(self):
+        saved = self.backgrounds.get(self.shownTest)
+        if saved is None or saved[:3] != self.graphView():
+            self.canvas.draw()
+            return
+        self.canvas.restore_region(saved[3])
+        self.drawOverlays()
+        self.canvas.blit(self.canvas.figure.bbox)
+
+    # Redraws the capture line from the pyramid for the new x range after a zoom or pan
+    def refineTrace(self, axes):
+        start, end = axes.get_xlim()
+        x, y = self.tracePyramid.query(start, end, self.canvas.width())
+        self.traceLine.set_data(x, y)
+        self.canvas.draw_idle()
 
     # Updates the graph with the test which is currently selected.
     def list_click_helper(self):
@@ -1099,16 +1483,27 @@ class Analysis(QWidget):
 
         # Get the currently selected test and various other data which allows us to get the step_list
         current_test = self.list_widget.selectedItems()[0].text()
-        index = self.testSuite.index(current_test)
-        data = self.testData[index]
-        params = self.getTestParams(current_test)
-        step_list = self.getStepList(data, params)
+        step_list = self.getSteps(self.testSuite.index(current_test))
 
         # If the current test only has one step, then diable the right_button as well
-        if len(step_list) == 1:
+        if len(step_list) <= 1:
             self.step_right_button.setEnabled(False)
+        if len(step_list) == 0:  # nothing was captured (see get_step_list), there is no step to show
+            self.clearResultsGraph()
+            return
         self.updateResultsGraph()
 
+    # Empties the results graph, i.e. when the selected test has no steps to show
+    def clearResultsGraph(self):
+        self.overlays = []
+        self.peakLabels = []
+        self.overlayStep = None
+        self.overlayData = None
+        self.labelledPeaks = np.zeros(0, dtype=np.int64)
+        self.shownTest = None
+        self.canvas.axes.clear()
+        self.canvas.draw()
+
 
 class MainWindow(QMainWindow):
     singleton: "MainWindow" = None
@@ -1122,11 +1517,14 @@ class MainWindow(QMainWindow):
         self.testList = []  # list of all test names
         self.testSuite = []  # test names in the Test Suite run order
         self.configuredTests = []  # configurations matching index in self.testList
-        self.testData = []
+        self.testData = []  # (channels x samples) capture of each test in the test suite
+        self.testChannels = []  # channel names of the rows of each capture in self.testData
+        self.testErrors = []  # AcquisitionError each capture in self.testData ended with (None if it completed)
+        self.streamResults = []  # StreamingAnalyzer that ran on each capture in self.testData while it was read
         self.results = []
         self.saved = False
         self.comm = Communicate()
-        self.webView = QWebEngineView()
+        self.testRunner = None  # Test Runner tab, a project can't be switched under a running suite
 
         self.setWindowTitle("Sandia User-Configurable Tester")
         self._config()
@@ -1134,18 +1532,14 @@ class MainWindow(QMainWindow):
         tabs = QTabWidget()
         tabs.setTabPosition(QTabWidget.TabPosition.North)
         tabs.setMovable(True)
-        tabs.addTab(TestRunner(self), "Test Runner")
+        self.testRunner = TestRunner(self)
+        tabs.addTab(self.testRunner, "Test Runner")
         tabs.addTab(Analysis(self), "Analysis")
         tabs.addTab(ReportPreview(self), "Report Preview")
         self.setCentralWidget(tabs)
         self._createMenu()
         self.resize(1600, 900)
-
-        # set webView as dummy, hide it, maximize window, and show it to as a workaround for close/reopen bug
-        self.webView.setUrl(QUrl(""))
-        self.webView.hide()
         self.showMaximized()
-        self.webView.show()
 
     def closeEvent(self, e):
         print("window closed")
@@ -1154,39 +1548,56 @@ class MainWindow(QMainWindow):
     def _config(self):
         self.init = profig.Config("init.cfg")
         self.init.init("lastopenedfile", "default.cfg", str)
+        self.init.init("live_graph_points", 2000, int)  # samples shown in the live graph
+        self.init.init("live_graph_fps", 30, int)  # live graph refreshes per second
+        self.init.init("live_graph_view", LIVE_VIEWS[0], str)  # widget the live graph is drawn on
+        self.init.init("startup_budget", 3.0, float)  # seconds from launch to the first window
+        self.init.sync()
+        self.loadProject(self.init["lastopenedfile"])
+
+    # Loads the project config file filename into this window
+    # The test lists shared by the tabs are updated in place and testListChanged/testSuiteChanged are only
+    # emitted for what actually changed, so only the widgets showing it are refreshed. The captures and
+    # results of the previous project are dropped if its tests or suite differ.
+    # A running suite is cancelled first, its tests and captures are about to be replaced
+    def loadProject(self, filename):
+        if self.testRunner is not None and not self.testRunner.testsFinished:
+            self.testRunner.stopTest()
+        self.init["lastopenedfile"] = filename
         self.init.sync()
-        filename = self.init["lastopenedfile"]
-        self.cfg = profig.Config(filename)
-        if filename != "default.cfg" and filename != "___.cfg":
-            self.saved = True
+        self.cfg = open_config(filename)
+        self.saved = filename != "default.cfg" and filename != "___.cfg"
         self.setWindowTitle("Sandia User-Configurable Tester || " + filename)
+        testList, testSuite, configuredTests = load_tests(self.cfg)
+        listChanged = testList != self.testList or configuredTests != self.configuredTests
+        suiteChanged = testSuite != self.testSuite
+        self.testList[:] = testList
+        self.configuredTests[:] = configuredTests
+        self.testSuite[:] = testSuite
+        if listChanged or suiteChanged:
+            self.testData.clear()
+            self.testChannels.clear()
+            self.testErrors.clear()
+            self.streamResults.clear()
+            self.results.clear()
+            self.comm.resultsCleared.emit()
+            peak_cache.clear()  # don't keep the discarded captures alive
+        if listChanged:
+            self.comm.testListChanged.emit()
+        if listChanged or suiteChanged:
+            self.comm.testSuiteChanged.emit()  # the Analysis tab drops the results of the old captures
 
-        # splitList = lambda x: list(x.split(","))
-        # listToStr = lambda x: ",".join(x)
-        # dictToStr = lambda x: json.dumps(x)
-        # splitDict = lambda x: json.loads(x)
-        # cfg.coercer.register(list, lambda x: ",".join(x), lambda x: list(x.split(",")))
-        self.cfg.coercer.register(
-            dict, lambda x: json.dumps(x), lambda x: json.loads(x)
-        )  # dict coercer does not work so string conversion/deconversion is needed when using dicts with the config file
-        self.cfg.init("test_list", [], list)
-        self.cfg.init("test_suite", [], list)
-        self.cfg.sync()
-        self.testList = self.cfg["test_list"]
-        self.testSuite = self.cfg["test_suite"]
-        for x in self.testList:
-            self.configuredTests.append(json.loads(self.cfg["section_test." + x]))
-        self.cfg.sync()
+    # Reloads the open project from its config file, discarding unsaved changes
+    def reloadProject(self):
+        self.loadProject(self.init["lastopenedfile"])
 
-    # Connected to button_new; restart window with "___.cfg" set as the current config file
+    # Connected to button_new; loads a new project with "___.cfg" set as the current config file
     def _new(self):
         if os.path.exists("___.cfg"):
             os.remove("___.cfg")
-        self.init["lastopenedfile"] = "___.cfg"
-        self.init.sync()
-        MainWindow.restart()
+        self.loadProject("___.cfg")
 
-    # Connected to button_open; choose file, then restart window
+    # Connected to button_open; choose file, then load it into the window
     def _open(self):
         dialog = QFileDialog(self)
         dialog.setFileMode(QFileDialog.ExistingFile)
@@ -1198,9 +1609,7 @@ class MainWindow(QMainWindow):
         if dialog.exec():
             filenames = dialog.selectedFiles()
         filename = os.path.basename(filenames[0])
-        self.init["lastopenedfile"] = filename
-        self.init.sync()
-        MainWindow.restart()
+        self.loadProject(filename)
 
     # Connected to button_save; save values to config file
     def _save(self):
@@ -1274,7 +1683,7 @@ class MainWindow(QMainWindow):
         file_menu.addAction(button_close)
 
         button_restart = QAction("&Restart Window", self)
-        button_restart.triggered.connect(MainWindow.restart)
+        button_restart.triggered.connect(self.reloadProject)
         file_menu.addAction(button_restart)
 
         help_menu = menu.addMenu("&Help")
@@ -1296,20 +1705,34 @@ class MainWindow(QMainWindow):
         self.comm.testDone.emit()
         # print(self.testSuite)
 
-    # Restarts program by setting MainWindow
+    # Creates the application's window (projects are then switched in place with loadProject)
     @staticmethod
     def restart():
         # os.chdir("..")
         MainWindow.singleton = MainWindow()
 
 
+# Prints the time from launch to the first window, with a warning when it's over init.cfg's startup_budget
+def report_startup_time():
+    elapsed = time.perf_counter() - launch_time
+    budget = MainWindow.singleton.init["startup_budget"]
+    print("Window shown", round(elapsed, 2), "s after launch")
+    if elapsed > budget:
+        print("Startup is over its", budget, "s budget (startup_budget in init.cfg)")
+
+
 # starts PyQt application
 def main():
+    # Qt WebEngine is only imported once the Report Preview tab is opened, which it allows as long as this is
+    # set before the application is created
+    QCoreApplication.setAttribute(Qt.AA_ShareOpenGLContexts)
     app = QApplication(sys.argv)
-    app.aboutToQuit.connect(reader.kill_reader_thread)
+    app.aboutToQuit.connect(reader.close)
     app.aboutToQuit.connect(generator.kill_generator_thread)
+    app.aboutToQuit.connect(analysis_pool.shutdown)
     app.setStyle("fusion")
     MainWindow.restart()
+    QTimer.singleShot(0, report_startup_time)  # runs once the window is up and the event loop is running
     sys.exit(app.exec())
 
 
@@ -0,0 +1,108 @@
+import argparse
+import sys
+
+from daq import Reader, Generator
+from signal_analysis import StreamingAnalyzer, get_step_list
+from project import open_config, load_tests, get_analysis_row, start_capture, test_results
+from report_writer import create_header, write_json, write_pdf
+
+
+# Runs the tests of a suite one after the other, the way the Test Runner tab does, and analyses them
+# Returns the results of the suite (a dict per test, see Analysis.updateResults in app.py)
+def run_suite(reader, generator, test_list, test_suite, configured_tests):
+    results = []
+    # (channels x samples) capture of the last test that read one, its channel names and the error it ended with
+    capture = None
+    channels = None
+    capture_error = None
+    try:
+        for test_name in test_suite:
+            testDict = configured_tests[test_list.index(test_name)]
+            if testDict.get("share_capture", False) and capture is not None:
+                # this test only analyses a channel of the previous test's capture, nothing to acquire
+                streamer = StreamingAnalyzer(testDict)
+                streamer.update(capture[get_analysis_row(testDict, channels)])
+            else:
+                streamer = StreamingAnalyzer(testDict, testDict.get("abort_on_fail", False))
+                row = get_analysis_row(testDict, reader.ai_chans)
+
+                # stops the capture if abort_on_fail is set and a streamed step has already failed
+                def stream_chunk(block):
+                    if not streamer.update(block[row]):
+                        reader.kill_reader_thread()
+
+                reader.set_chunk_listener(stream_chunk)
+                try:
+                    start_capture(reader, generator, testDict)
+                except ValueError as e:  # the test can't be run as configured
+                    reader.set_chunk_listener(None)
+                    print(e)  # the message already starts with the test name
+                    results.append(
+                        {"test_name": test_name, "test_passed": False, "results": [], "error": str(e)}
+                    )
+                    capture = None
+                    continue
+                reader.join_reader_thread()
+                reader.set_chunk_listener(None)
+                capture = reader.getArray()
+                channels = reader.getReadChannels()
+                capture_error = reader.error
+                reader.clearArray()
+            data = capture[get_analysis_row(testDict, channels)]
+            try:
+                step_list = get_step_list(data, testDict)
+            except Exception as e:  # the test can't be analysed, it fails with the error
+                print(test_name + ": analysis failed:", e)
+                results.append(
+                    {"test_name": test_name, "test_passed": False, "results": [], "error": str(e)}
+                )
+                continue
+            results.append(test_results(test_name, step_list, streamer, capture_error))
+            print(test_name + ":", "passed" if results[-1]["test_passed"] else "failed")
+    finally:  # the generator thread isn't a daemon, the process would never exit with it running
+        generator.kill_generator_thread()
+        generator.join_generator_thread()
+    return results
+
+
+# Runs the test suite of a project without the GUI (Qt is never imported) and writes its report
+# i.e. python cli.py tests.cfg --ai Dev1/ai0 Dev1/ai1 --json report.json --pdf report.pdf
+# Exits with 0 if the suite passed (at least --threshold tests passed, all of them by default), 1 otherwise.
+# Set SUCT_BACKEND=sim to run it on the simulated DAQ
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a test suite and write its report")
+    parser.add_argument("config", help="project config file saved by the app (i.e. default.cfg)")
+    parser.add_argument("--ai", nargs="+", default=["Dev1/ai0"], help="analog input channels to read")
+    parser.add_argument("--ao", default="Dev1/ao0", help="analog output channel of the stimulus")
+    parser.add_argument("--json", help="write the report as JSON to this file")
+    parser.add_argument("--pdf", help="write the report as a PDF to this file")
+    parser.add_argument("--name", default="", help="report name")
+    parser.add_argument("--threshold", type=int, help="tests that must pass (default: all)")
+    parser.add_argument("--custom-title", default="", help="title of the report's custom field")
+    parser.add_argument("--custom-text", default="", help="text of the report's custom field")
+    args = parser.parse_args(argv)
+
+    test_list, test_suite, configured_tests = load_tests(open_config(args.config))
+    if len(test_suite) == 0:
+        print("No tests in the test suite of", args.config)
+        return 1
+    reader = Reader()
+    generator = Generator()
+    reader.set_ai_channels(args.ai)
+    generator.set_ao_channel(args.ao)
+    results = run_suite(reader, generator, test_list, test_suite, configured_tests)
+
+    threshold = args.threshold if args.threshold is not None else len(results)
+    header = create_header(results, args.name, threshold, args.custom_title, args.custom_text)
+    if args.json:
+        write_json(args.json, header, results)
+        print("JSON exported to ", args.json)
+    if args.pdf:
+        write_pdf(args.pdf, header, results, args.custom_title)
+        print("PDF exported to ", args.pdf)
+    print("Tests passed:", header["tests_passed"])
+    return 0 if header["result"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
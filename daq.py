@@ -1,202 +1,1000 @@
-import nidaqmx
 import threading
-from nidaqmx.types import CtrTime
-from nidaqmx import stream_readers
-from nidaqmx import stream_writers
+import functools
+import os
+import multiprocessing
+from multiprocessing import shared_memory
 import numpy as np
 
+try:
+    import nidaqmx
+    from nidaqmx import stream_readers
+    from nidaqmx import stream_writers
+except ImportError:  # without nidaqmx only the simulated backend can be used
+    nidaqmx = None
+
+
+# Raised by a backend when reading or writing fails (i.e. a DAQ buffer overrun)
+class AcquisitionError(Exception):
+    pass
+
+
+# Backends hide where samples come from so Reader and Generator don't depend on real hardware.
+# NidaqmxBackend talks to NI devices, SimulatedBackend (simulated_daq.py) is a pure-numpy loopback device.
+# Every backend provides:
+#   discover() -> (deviceNames, ai_channels, ao_channels)
+#   open_input(channels, sample_rate, buffer_size, sync_output=None, trigger=None) -> input task with start(),
+#       read(out, n, timeout) and close(). channels is a list of ai channels sampled together; read() fills out,
+#       a (channels x n) float64 array. If sync_output (an output task) is given the input runs off that
+#       output's sample clock and start trigger, so sample k of the input lines up with sample k of the output.
+#       trigger is a hardware trigger (see Reader.read) for a finite capture of buffer_size samples, the first
+#       trigger["pretrigger_samples"] of which come from before the trigger
+#   open_output(channel, waveform, sample_rate) -> output task with start(), stop(), close() and sample_rate
+# Tasks are context managers that close themselves and raise AcquisitionError when the device fails.
+class NidaqmxBackend:
+    # enumerates the devices visible in NI MAX and the names of their physical channels
+    def discover(self):
+        devices = nidaqmx.system.System.local().devices
+        deviceNames = [device.name for device in devices]
+        ai_channels = {}
+        ao_channels = {}
+        for device in devices:
+            ai_channels[device.name] = [channel.name for channel in device.ai_physical_chans]
+            ao_channels[device.name] = [channel.name for channel in device.ao_physical_chans]
+        return deviceNames, ai_channels, ao_channels
+
+    def open_input(self, channels, sample_rate, buffer_size, sync_output=None, trigger=None):
+        return NidaqmxInputTask(channels, sample_rate, buffer_size, sync_output, trigger)
+
+    def open_output(self, channel, waveform, sample_rate):
+        return NidaqmxOutputTask(channel, waveform, sample_rate)
+
+
+# Shared context manager/close handling of the nidaqmx tasks
+class NidaqmxTask:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.task.close()
+
+
+# Continuous analog input task over one or more channels, read in blocks with AnalogMultiChannelReader
+class NidaqmxInputTask(NidaqmxTask):
+    def __init__(self, channels, sample_rate, buffer_size, sync_output=None, trigger=None):
+        self.task = nidaqmx.Task()
+        try:
+            for channel in channels:
+                self.task.ai_channels.add_ai_voltage_chan(
+                    channel
+                )  # assigns task to analog in channels on daq, all sampled off one clock
+            if trigger is not None:
+                # finite capture of the window around the trigger
+                self.task.timing.cfg_samp_clk_timing(
+                    sample_rate,
+                    sample_mode=nidaqmx.constants.AcquisitionType.FINITE,
+                    samps_per_chan=buffer_size,
+                )
+                if trigger["slope"] == "Falling":
+                    slope = nidaqmx.constants.Slope.FALLING
+                    edge = nidaqmx.constants.Edge.FALLING
+                else:
+                    slope = nidaqmx.constants.Slope.RISING
+                    edge = nidaqmx.constants.Edge.RISING
+                if trigger["type"] == "Analog Edge":
+                    self.task.triggers.reference_trigger.cfg_anlg_edge_ref_trig(
+                        trigger["source"],
+                        pretrigger_samples=trigger["pretrigger_samples"],
+                        trigger_slope=slope,
+                        trigger_level=trigger["level"],
+                    )
+                else:  # Digital Edge
+                    self.task.triggers.start_trigger.cfg_dig_edge_start_trig(
+                        trigger["source"], trigger_edge=edge
+                    )
+            elif sync_output is None:
+                self.task.timing.cfg_samp_clk_timing(
+                    sample_rate,
+                    sample_mode=nidaqmx.constants.AcquisitionType.CONTINUOUS,
+                    samps_per_chan=buffer_size,
+                )  # sets the sample rate of DAQ channel and sizes the DAQ buffer
+            else:
+                # sample off the AO sample clock and wait for the AO start trigger
+                self.task.timing.cfg_samp_clk_timing(
+                    sync_output.sample_rate,
+                    source=sync_output.terminal("SampleClock"),
+                    sample_mode=nidaqmx.constants.AcquisitionType.CONTINUOUS,
+                    samps_per_chan=buffer_size,
+                )
+                self.task.triggers.start_trigger.cfg_dig_edge_start_trig(
+                    sync_output.terminal("StartTrigger")
+                )
+            self.stream_reader = stream_readers.AnalogMultiChannelReader(
+                self.task.in_stream
+            )
+        except nidaqmx.errors.DaqError as e:
+            self.task.close()
+            raise AcquisitionError(e) from e
+
+    def start(self):
+        try:
+            self.task.start()
+        except nidaqmx.errors.DaqError as e:
+            raise AcquisitionError(e) from e
+
+    # reads n samples per channel into the C-contiguous float64 (channels x n) array out
+    def read(self, out, n, timeout):
+        try:
+            self.stream_reader.read_many_sample(
+                out, number_of_samples_per_channel=n, timeout=timeout
+            )
+        except nidaqmx.errors.DaqError as e:
+            raise AcquisitionError(e) from e
+
+
+# Analog output task that writes one waveform period once and lets the device regenerate it
+# off its own sample clock
+class NidaqmxOutputTask(NidaqmxTask):
+    def __init__(self, channel, waveform, sample_rate):
+        self.channel = channel
+        self.sample_rate = sample_rate
+        self.task = nidaqmx.Task()
+        try:
+            self.task.ao_channels.add_ao_voltage_chan(channel)
+            self.task.timing.cfg_samp_clk_timing(
+                sample_rate,
+                sample_mode=nidaqmx.constants.AcquisitionType.CONTINUOUS,
+                samps_per_chan=len(waveform),
+            )  # hardware sample clock with a buffer holding exactly one period
+            self.task.out_stream.regen_mode = (
+                nidaqmx.constants.RegenerationMode.ALLOW_REGENERATION
+            )
+            stream_writer = stream_writers.AnalogSingleChannelWriter(
+                self.task.out_stream, auto_start=False
+            )
+            stream_writer.write_many_sample(
+                np.ascontiguousarray(waveform, dtype=np.float64)
+            )
+        except nidaqmx.errors.DaqError as e:
+            self.task.close()
+            raise AcquisitionError(e) from e
+
+    def start(self):
+        try:
+            self.task.start()
+        except nidaqmx.errors.DaqError as e:
+            raise AcquisitionError(e) from e
+
+    def stop(self):
+        try:
+            self.task.stop()
+        except nidaqmx.errors.DaqError as e:
+            raise AcquisitionError(e) from e
+
+    # returns the name of one of the AO subsystem's terminals (i.e. "/Dev1/ao/SampleClock")
+    def terminal(self, name):
+        device = self.channel.split("/")[0]
+        return "/" + device + "/ao/" + name
+
+
+# Backend shared by every Reader and Generator that isn't given one, so a simulated device can loop
+# the generator's output back into the reader. Chosen with the SUCT_BACKEND environment variable
+# ("nidaqmx" by default or "sim") unless set_backend() is called first.
+default_backend = None
+
+
+def get_backend():
+    global default_backend
+    if default_backend is None:
+        if os.environ.get("SUCT_BACKEND", "nidaqmx").lower() in ("sim", "simulated"):
+            from simulated_daq import SimulatedBackend
+
+            default_backend = SimulatedBackend()
+        else:
+            default_backend = NidaqmxBackend()
+    return default_backend
+
+
+def set_backend(backend):
+    global default_backend
+    default_backend = backend
+
+
+# Runs backend.discover() in a background thread; get() waits for and returns its result
+class Discovery:
+    def __init__(self, backend):
+        self.result = None
+        self.error = None
+        self.thread = threading.Thread(target=self.run, args=[backend], daemon=True)
+        self.thread.start()
+
+    def run(self, backend):
+        try:
+            self.result = backend.discover()
+        except Exception as e:  # raised to whoever needs the devices
+            self.error = e
+
+    def get(self):
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+# Enumerating every device and its physical channels is slow on real hardware, so each backend is only
+# discovered once and every Daq on it shares the result
+discoveries = {}  # backend -> its Discovery
+discovery_lock = threading.Lock()
+
+
+# Starts discovering the devices of a backend (the default backend if None) in the background, unless that
+# has already been done; returns its Discovery
+def start_discovery(backend=None):
+    backend = backend if backend is not None else get_backend()
+    with discovery_lock:
+        if backend not in discoveries:
+            discoveries[backend] = Discovery(backend)
+        return discoveries[backend]
+
 
 # Super class of Reader and Generator
 # Stores general information about the DAQs that are connected to the desktop
+# The devices are only discovered the first time one of deviceNames/ai_channels/ao_channels is used (or in
+# the background from start_discovery()), so creating a Daq is cheap, i.e. in a child process that never
+# looks at them
 class Daq:
-    def __init__(self):
-        self.devices = nidaqmx.system.System.local().devices
-        self.deviceNames = list(map(lambda x: x.name, self.devices))
-        self.ai_channels = {}  # dictionary of all ai channels (i.e. {Dev1: Dev1/ai0})
-        self.ao_channels = {}  # dictionary of all ao channels (i.e. {Dev1: Dev1/ao0})
-
-        # initialize the channels (unpackages the nidaqmx types to just get the names)
-        for device in self.devices:
-            chanNames = []
-            for channel in device.ai_physical_chans:
-                chanNames.append(channel.name)
-            self.ai_channels[device.name] = chanNames
-
-        for device in self.devices:
-            chanNames = []
-            for channel in device.ao_physical_chans:
-                chanNames.append(channel.name)
-            self.ao_channels[device.name] = chanNames
+    def __init__(self, backend=None):
+        self.backend = backend if backend is not None else get_backend()
+
+    # deviceNames is a list of device names, ai_channels/ao_channels are dictionaries of all
+    # ai/ao channels (i.e. {Dev1: [Dev1/ai0, ...]})
+    @property
+    def deviceNames(self):
+        return start_discovery(self.backend).get()[0]
+
+    @property
+    def ai_channels(self):
+        return start_discovery(self.backend).get()[1]
+
+    @property
+    def ao_channels(self):
+        return start_discovery(self.backend).get()[2]
+
+
+# Fixed-capacity numpy ring buffer that the reader thread writes into while the Qt thread reads from it
+# Samples are stored as a (channels x capacity) array and every read/write is a (channels x n) block
+# count is the write cursor (total samples per channel ever written); it is only advanced after a block
+# has been copied in, so readers never see samples that have not been written yet
+class RingBuffer:
+    def __init__(self, capacity, dtype=np.float64, channels=1):
+        self.capacity = max(int(capacity), 1)
+        self.channels = channels
+        self.buffer = np.zeros((channels, self.capacity), dtype=dtype)
+        self.count = 0
+
+    # returns the number of samples per channel currently held in the buffer
+    def size(self):
+        return min(self.count, self.capacity)
+
+    # returns a writable view of the next n slots if they don't wrap around the end, otherwise None
+    # the samples only become visible to readers once commit(n) is called
+    def reserve(self, n):
+        start = self.count % self.capacity
+        if start + n > self.capacity:
+            return None
+        return self.buffer[:, start : start + n]
+
+    # advances the write cursor past n samples that were written into a reserve()d slot
+    def commit(self, n):
+        self.count += n
+
+    # copies a (channels x n) block of samples in at the write cursor, wrapping around to the start if needed
+    def write(self, block):
+        block = np.atleast_2d(block)
+        n = block.shape[1]
+        if n > self.capacity:  # only the newest capacity samples can be kept
+            self.count += n - self.capacity
+            block = block[:, -self.capacity :]
+            n = self.capacity
+        start = self.count % self.capacity
+        first = min(n, self.capacity - start)
+        self.buffer[:, start : start + first] = block[:, :first]
+        self.buffer[:, : n - first] = block[:, first:]
+        self.count += n
+
+    # returns the last n samples of every channel in the order they were written
+    # this is a zero-copy view unless the samples wrap around the end of the buffer
+    def tail(self, n):
+        count = self.count
+        return self.range(count - min(n, self.size()), count)
+
+    # returns samples start to end (counted from the first sample ever written) of every channel
+    # the samples must still be held in the buffer; a zero-copy view unless they wrap around its end
+    def range(self, start, end):
+        n = end - start
+        end = end % self.capacity
+        if end == 0 and n > 0:
+            end = self.capacity
+        if n <= end:
+            return self.buffer[:, end - n : end]
+        return np.concatenate(
+            (self.buffer[:, self.capacity - (n - end) :], self.buffer[:, :end]), axis=1
+        )
+
+    # returns every sample held in the buffer in the order they were written
+    def view(self):
+        return self.tail(self.size())
+
+
+# SharedMemory block that stays mapped for as long as numpy arrays into it are alive
+# SharedMemory.close() (also called from __del__) unmaps the block even while numpy views of it exist, which
+# crashes whoever reads them next. Here close() does nothing and the file descriptor is closed straight away;
+# the mapping is released when the last array (through the memoryview it holds) goes away
+class SharedBlock(shared_memory.SharedMemory):
+    def __init__(self, name=None, create=False, size=0):
+        shared_memory.SharedMemory.__init__(self, name, create, size)
+        if getattr(self, "_fd", -1) >= 0:  # POSIX only, the mmap doesn't need it
+            os.close(self._fd)
+            self._fd = -1
+
+    def close(self):
+        pass
+
+
+# RingBuffer whose samples and write cursor live in a multiprocessing.shared_memory block, so a reader in a
+# child process can fill it while the Qt process maps the same memory
+# Layout: an int64 write cursor followed by the (channels x capacity) samples. The cursor is a single aligned
+# 8 byte store that the writer only makes after the samples are in place, so readers never see a torn index
+# name - None creates a new block, otherwise the name of an existing block to attach to
+# readonly - the numpy views handed out can't be written to
+class SharedRingBuffer(RingBuffer):
+    def __init__(self, capacity, dtype=np.float64, channels=1, name=None, readonly=False):
+        self.capacity = max(int(capacity), 1)
+        self.channels = channels
+        size = 8 + self.capacity * channels * np.dtype(dtype).itemsize
+        if name is None:
+            self.shm = SharedBlock(create=True, size=size)
+        else:
+            self.shm = SharedBlock(name=name)
+        self.header = np.ndarray((1,), dtype=np.int64, buffer=self.shm.buf)
+        self.buffer = np.ndarray(
+            (channels, self.capacity), dtype=dtype, buffer=self.shm.buf, offset=8
+        )
+        if readonly:
+            self.buffer.setflags(write=False)
+
+    @property
+    def count(self):
+        return int(self.header[0])
+
+    @count.setter
+    def count(self, value):
+        self.header[0] = value
+
+
+# returns the index of the first sample of samples that is past a crossing of level, or None if there is none
+# input: rising - look for rising (True) or falling (False) crossings,
+#        previous - the sample before samples[0] (so crossings between blocks are found), None if there is none
+def find_level_crossing(samples, level, rising=True, previous=None):
+    if previous is None:
+        before = samples[:-1]
+        after = samples[1:]
+        offset = 1
+    else:
+        before = np.concatenate(([previous], samples[:-1]))
+        after = samples
+        offset = 0
+    if rising:
+        crossings = np.flatnonzero((before < level) & (after >= level))
+    else:
+        crossings = np.flatnonzero((before > level) & (after <= level))
+    if len(crossings) == 0:
+        return None
+    return int(crossings[0]) + offset
 
 
 # Class that generates thread that will read in signal on DAQ
 class Reader(Daq):
-    def __init__(self):
-        self.retArray = []
+    def __init__(self, backend=None):
+        self.dtype = np.float64  # dtype samples are stored as (np.float32 halves the memory)
+        self.buffer = RingBuffer(1, self.dtype)  # replaced by a buffer sized for each test in read()
         self.kill = False
         self.sample_rate = 1
-        self.ai_chan = "Dev1/ai0"
-
-        Daq.__init__(self)
+        self.ai_chans = ["Dev1/ai0"]  # channels sampled together, rows of the read data in this order
+        self.read_chans = list(self.ai_chans)  # channels of the data currently in self.buffer
+        self.chunk_size = None  # samples per read_many_sample call, None picks ~100 ms of data
+        self.error = None  # last AcquisitionError raised by the read loop (i.e. a buffer overrun)
+        self.reader_thread = None
+        self.done_callback = None  # called from the reader thread once a read finishes and its task is closed
+        self.chunk_listener = None  # called from the reader thread with every block of the capture as it's read
+
+        Daq.__init__(self, backend)
+
+    # returns the number of samples pulled from the DAQ buffer per read
+    # input: sample_rate - in hz
+    # output: self.chunk_size if it was set, otherwise ~100 ms of samples
+    def get_chunk_size(self, sample_rate):
+        if self.chunk_size is not None:
+            return max(int(self.chunk_size), 1)
+        return max(int(sample_rate / 10), 1)
+
+    # Sets the number of samples pulled from the DAQ buffer per read (None for automatic)
+    def set_chunk_size(self, chunk_size):
+        self.chunk_size = chunk_size
+
+    # Sets the dtype of the buffer samples are stored in (np.float64 or np.float32)
+    def set_dtype(self, dtype):
+        self.dtype = dtype
 
     # function to read from daq device with a custom sample rate (hz)
-    # input: sample_rate - in hz, duration - length of test in seconds
-    # output: updated data in retArray
-    def read(self, sample_rate, duration):
+    # all of self.ai_chans are sampled together in one task; samples are pulled off the DAQ buffer in blocks
+    # of get_chunk_size() into a (channels x samples) ring buffer that is preallocated for the whole test
+    # input: sample_rate - in hz, duration - length of test in seconds (after the trigger if there is one)
+    #        sync - a Generator started with synchronized=True; the input then runs off its AO sample clock
+    #               (at its sample rate) and only starts when the armed input releases the AO start trigger
+    #        trigger - None to record straight away, otherwise a dict describing the event to capture:
+    #               type - "Analog Edge" (hardware reference trigger), "Digital Edge" (hardware start trigger,
+    #                      no pre-trigger samples) or "Software" (level crossing found in the read data)
+    #               source - analog channel/terminal or digital terminal (i.e. "/Dev1/PFI0"); for "Software"
+    #                        one of the read channels (the first one if it isn't)
+    #               level - trigger level in volts, slope - "Rising" or "Falling"
+    #               pretrigger - seconds of signal kept from before the trigger
+    #               timeout - seconds to wait for the trigger
+    #        only the pretrigger + duration window around the event is kept
+    # output: updated data in self.buffer
+    def read(self, sample_rate, duration, sync=None, trigger=None):
+        self.error = None
+        sync_output = None
+        if sync is not None:
+            sync_output = sync.wait_for_output()
+            if sync_output is None:
+                self.error = AcquisitionError("The generator did not start a synchronized output")
+                print("Reader stopped: ", self.error)
+                return
+            sample_rate = sync_output.sample_rate
         self.sample_rate = sample_rate  # sets the sample rate in the class
-        with nidaqmx.Task() as task:  # create Task
-            task.ai_channels.add_ai_voltage_chan(
-                self.ai_chan
-            )  # assigns task to analog in channel on daq
-
-            task.timing.cfg_samp_clk_timing(
-                sample_rate, sample_mode=nidaqmx.constants.AcquisitionType.CONTINUOUS
-            )  # sets the sample rate of DAQ channel
-
-            # Read from DAQ until samples are all collected
-            try:
-                for _ in range(int(sample_rate * duration)):
-                    if self.kill:
-                        break
-                    data = task.read()
-                    self.retArray.append(data)
-            except:
-                pass
-
-    # returns the length of the current dataSize
+        channels = list(self.ai_chans)
+        pre_samples = 0
+        hardware_trigger = None
+        if trigger is not None:
+            if trigger["type"] != "Digital Edge":  # a start trigger can't keep samples from before it
+                pre_samples = int(sample_rate * trigger["pretrigger"])
+            if trigger["type"] != "Software":
+                hardware_trigger = dict(trigger, pretrigger_samples=pre_samples)
+        total_samples = pre_samples + int(sample_rate * duration)
+        self.buffer = self.new_buffer(total_samples, len(channels))
+        self.read_chans = channels
+        chunk_size = min(self.get_chunk_size(sample_rate), self.buffer.capacity)
+        # used when a block can't be read in place (more than one channel, or a float32 buffer)
+        chunk = np.zeros((len(channels), chunk_size), dtype=np.float64)
+        # a block should never take more than twice its own length to arrive
+        timeout = max(2 * chunk_size / sample_rate, 1.0)
+        if hardware_trigger is not None:  # the first block only arrives after the trigger
+            timeout += trigger["timeout"]
+
+        # Read from DAQ until samples are all collected
+        try:
+            with self.backend.open_input(
+                channels,
+                sample_rate,
+                max(total_samples, 4 * chunk_size),
+                sync_output,
+                hardware_trigger,
+            ) as task:
+                task.start()
+                if sync is not None:
+                    sync.release_output()  # the input is armed, start the AO (and with it the AI)
+                if trigger is not None and trigger["type"] == "Software":
+                    self.read_software_triggered(task, trigger, total_samples - pre_samples, chunk, timeout)
+                else:
+                    while self.buffer.count < total_samples and not self.kill:
+                        n = min(chunk_size, total_samples - self.buffer.count)
+                        self.read_block(task, n, chunk, timeout)
+        except AcquisitionError as e:
+            self.error = e
+            print("Reader stopped: ", e)
+
+    # reads n samples per channel from task into the ring buffer; in place if the free slots allow it
+    # notify - pass the block on to the chunk listener (False while it may not end up in the capture)
+    def read_block(self, task, n, chunk, timeout, notify=True):
+        slot = self.buffer.reserve(n)
+        if slot is not None and slot.dtype == np.float64 and slot.flags.c_contiguous:
+            task.read(slot, n, timeout)
+            self.buffer.commit(n)
+        else:
+            block = chunk if n == chunk.shape[1] else np.zeros((chunk.shape[0], n))
+            task.read(block, n, timeout)
+            self.buffer.write(block)
+        if notify:
+            self.notify_chunk(n)
+
+    # hands the last n samples read (a (channels x n) view of the ring buffer) to the chunk listener
+    def notify_chunk(self, n):
+        if self.chunk_listener is not None and n > 0:
+            self.chunk_listener(self.buffer.tail(n))
+
+    # reads continuously into the (pre-trigger + post-trigger sized) ring buffer until the trigger channel
+    # crosses the trigger level, then reads post_samples more, so the buffer ends up holding the window
+    # around the event
+    def read_software_triggered(self, task, trigger, post_samples, chunk, timeout):
+        row = 0
+        if trigger["source"] in self.read_chans:
+            row = self.read_chans.index(trigger["source"])
+        rising = trigger["slope"] != "Falling"
+        give_up = int(trigger["timeout"] * self.sample_rate)  # samples to wait for the trigger
+        trigger_index = None  # index (in samples read) of the first sample after the crossing
+        pre_samples = self.buffer.capacity - post_samples
+        previous = None
+        while not self.kill:
+            if trigger_index is None:
+                if self.buffer.count >= give_up:
+                    raise AcquisitionError(
+                        "No trigger within " + str(trigger["timeout"]) + " s"
+                    )
+                # never read past trigger + post_samples, the samples before the trigger would be overwritten
+                n = min(chunk.shape[1], max(post_samples, 1))
+            else:
+                n = min(chunk.shape[1], trigger_index + post_samples - self.buffer.count)
+                if n <= 0:
+                    break
+            start = self.buffer.count
+            self.read_block(task, n, chunk, timeout, notify=trigger_index is not None)
+            if trigger_index is None:
+                samples = self.buffer.tail(n)[row]
+                # like a reference trigger, crossings before the pre-trigger window has filled are ignored
+                skip = max(pre_samples - start, 0)
+                if skip < n:
+                    crossing = find_level_crossing(
+                        samples[skip:],
+                        trigger["level"],
+                        rising,
+                        previous if skip == 0 else samples[skip - 1],
+                    )
+                    if crossing is not None:
+                        trigger_index = start + skip + crossing
+                        # the listener only gets the capture window, starting with the pre-trigger samples
+                        self.notify_chunk(self.buffer.count - (trigger_index - pre_samples))
+                previous = samples[-1]
+
+    # returns the buffer read() fills for a test
+    def new_buffer(self, capacity, channels):
+        return RingBuffer(capacity, self.dtype, channels)
+
+    # returns the number of samples per channel read so far
     def getCurrDataSize(self):
-        return len(self.retArray)
+        return self.buffer.count
 
-    # returns all of retArray
+    # returns all of the read data as a (channels x samples) array, rows in the order of getReadChannels()
+    # (a view into the ring buffer, read() allocates a new one for the next test)
     def getArray(self):
-        return self.retArray
+        return self.buffer.view()
 
-    # return last n samples
-    def getEndArray(self, n):
-        return self.retArray[-n:]
+    # returns the channels of the rows of getArray()
+    def getReadChannels(self):
+        return self.read_chans
 
-    # empties retArray
+    # return last n samples of one channel (an index into getReadChannels())
+    def getEndArray(self, n, channel=0):
+        return self.buffer.tail(n)[channel]
+
+    # empties the read data; arrays already handed out by getArray() are left untouched
     def clearArray(self):
-        self.retArray.clear()
+        self.buffer = RingBuffer(1, self.dtype, len(self.read_chans))
 
     # Sets the input channel that the thread will read on
     def set_ai_channel(self, chan):
-        self.ai_chan = chan
+        self.ai_chans = [chan]
+
+    # Sets the input channels that the thread will read on together
+    def set_ai_channels(self, chans):
+        self.ai_chans = list(chans)
+
+    # Sets the function called (from the reader thread) when an acquisition completes
+    def set_done_callback(self, callback):
+        self.done_callback = callback
+
+    # Sets the function called (from the reader thread) with each (channels x n) block of a capture, in order,
+    # as soon as it is read; None to stop. The block is a view into the capture, the listener must not keep
+    # it past the call or write to it. Calling kill_reader_thread() from the listener ends the capture early
+    def set_chunk_listener(self, listener):
+        self.chunk_listener = listener
+
+    # runs read() and reports completion; the DAQ task is already closed when done_callback is called
+    def read_and_notify(self, hz, duration, sync=None, trigger=None):
+        try:
+            self.read(hz, duration, sync, trigger)
+        finally:
+            if self.done_callback is not None:
+                self.done_callback()
 
     # spawns a thread for reading on daq
-    # input: hz - the sample rate we want the daq to be at (in hz obv)
+    # input: hz - the sample rate we want the daq to be at (in hz obv), sync and trigger - see read()
     # output: a running thread for reading
-    def start_reader_thread(self, hz, duration):
+    def start_reader_thread(self, hz, duration, sync=None, trigger=None):
         self.kill = False
-        reader_thread = threading.Thread(target=self.read, args=[hz, duration])
-        reader_thread = threading.Thread(target=self.read, args=[hz, duration])
-        reader_thread.start()
+        self.reader_thread = threading.Thread(
+            target=self.read_and_notify, args=[hz, duration, sync, trigger]
+        )
+        self.reader_thread.start()
 
     # kills all reader threads
     def kill_reader_thread(self):
         self.kill = True
 
-
-# Class that generates thread that will produce a signal on DAQ
-class Generator(Daq):
-    def __init__(self):
-        self.ao_chan = "Dev1/ao0"  # default channel to produce signal on
-        self.kill = False  # signal to tell the generator thread to stop
-        self.signals = {"Sine": self.sine_wave_gen, "Step": self.step_function_gen, "Square": self.square_wave_gen}#["Sine", "Step", "Square"]
-        self.currSignal = list(self.signals.keys())[0]
-        Daq.__init__(self)
-
-    # function to produce a signal on a daq that looks like a stair case
-    # input: none
-    # output: Signal being produced on DAQ out channel
-    def step_function_gen(self):
-        while not self.kill:
-            try:
-                with nidaqmx.Task() as task:
-                    task.ao_channels.add_ao_voltage_chan(
-                        self.ao_chan
-                    )  # assigns task to analog out channel ao0 on daq
-                    task.write([1.1], auto_start=True)  # write out these voltages
-                    task.write([2.2], auto_start=True)  # write out these voltages
-                    task.write([3.3], auto_start=True)  # write out these voltages
-                    task.write([4.4], auto_start=True)  # write out these voltages
-            except:
-                break
-
-    # function to produce a square wave on DAQ out channel
-    # input: none
-    # output: Square waves on the analog out channel
-    def square_wave_gen(self):
-        with nidaqmx.Task() as task:
-            task.ao_channels.add_ao_voltage_chan(self.ao_chan)
-
-            # Set up a stream writer for the task
-            stream_writer = nidaqmx.stream_writers.AnalogSingleChannelWriter(
-                task.out_stream, auto_start=True
-            )
-
-            # Configure the sample rate, frequency, and amplitude of the square wave
-            sample_rate = 2000  # 2 kHz sample rate
-            square_wave_frequency = 100  # Frequency of the square wave in Hz
-            amplitude = 5.0  # Amplitude of the square wave
-
-            # Calculate the number of samples for one cycle of the square wave
-            samples_per_cycle = int(sample_rate / square_wave_frequency)
-
-            # Create a square wave waveform
-            waveform = np.zeros(samples_per_cycle)
-            half_cycle_samples = int(samples_per_cycle / 2)
-            waveform[:half_cycle_samples] = amplitude
-            waveform[half_cycle_samples:] = -amplitude
-
-            # Write the square wave continuously
-            while not self.kill:
-                stream_writer.write_many_sample(waveform)
-
-    def sine_wave_gen(self):
-        with nidaqmx.Task() as task:
-            task.ao_channels.add_ao_voltage_chan(self.ao_chan)
-
-            # Set up a stream writer for the task
-            stream_writer = nidaqmx.stream_writers.AnalogSingleChannelWriter(
-                task.out_stream, auto_start=True
+    # waits for the reader thread to exit
+    def join_reader_thread(self, timeout=None):
+        if self.reader_thread is not None:
+            self.reader_thread.join(timeout)
+
+    # releases anything the reader holds on to when the application quits
+    def close(self):
+        self.kill_reader_thread()
+
+
+# Reader that runs in a child process and fills a SharedRingBuffer, so the Qt process (live plot redraws,
+# analysis) can never starve the DAQ read loop of the GIL
+class SharedMemoryWriter(Reader):
+    def __init__(self, backend, shm_name):
+        Reader.__init__(self, backend)
+        self.shm_name = shm_name
+
+    def new_buffer(self, capacity, channels):
+        return SharedRingBuffer(capacity, self.dtype, channels, self.shm_name)
+
+
+# Stops reader's read (like kill_reader_thread) once kill_event is set; returns when done is set
+def watch_kill_event(kill_event, reader, done):
+    while not done.is_set():
+        if kill_event.wait(0.05):
+            reader.kill = True
+            return
+
+
+# Body of the ProcessReader's child process; runs one read per command received on conn until told to stop
+# A command is (backend, shm_name, channels, dtype, chunk_size, sample_rate, duration, trigger) and the reply is
+# (sample_rate, error message or None). kill_event stops the read in progress.
+def process_reader_main(conn, kill_event):
+    while True:
+        command = conn.recv()
+        if command is None:
+            return
+        backend, shm_name, channels, dtype, chunk_size, sample_rate, duration, trigger = command
+        reader = SharedMemoryWriter(backend, shm_name)
+        reader.set_ai_channels(channels)
+        reader.set_dtype(dtype)
+        reader.set_chunk_size(chunk_size)
+        done = threading.Event()
+        watcher = threading.Thread(
+            target=watch_kill_event, args=[kill_event, reader, done], daemon=True
+        )
+        watcher.start()
+        try:
+            reader.read(sample_rate, duration, trigger=trigger)
+        finally:
+            done.set()  # the watcher exits, the child doesn't gain a thread per read
+            watcher.join()
+        conn.send((reader.sample_rate, None if reader.error is None else str(reader.error)))
+
+
+# Reader with the same interface whose read loop runs in a long-lived child process
+# The Qt process creates the shared ring buffer for each test and only ever maps it read-only; the reader
+# thread here just waits for the child's reply and then calls done_callback
+# Synchronized captures need the generator's task, so they still run in a thread of this process
+class ProcessReader(Reader):
+    def __init__(self, backend=None):
+        Reader.__init__(self, backend)
+        self.context = multiprocessing.get_context("spawn")
+        self.kill_event = self.context.Event()
+        self.conn = None
+        self.process = None
+
+    # starts the child process the first time it is needed
+    # (not in __init__: a spawned child re-imports the main module, which may create a ProcessReader too)
+    def start_process(self):
+        if self.process is not None and self.process.is_alive():
+            return
+        self.conn, child_conn = self.context.Pipe()
+        self.process = self.context.Process(
+            target=process_reader_main, args=(child_conn, self.kill_event), daemon=True
+        )
+        self.process.start()
+
+    # sends one read to the child process and waits for it to finish
+    # while waiting the samples the child has written are passed on to the chunk listener (for software
+    # triggered captures only once the read is done, before that the buffer also holds pre-trigger samples)
+    def read_in_process(self, hz, duration, trigger):
+        self.error = None
+        stream = trigger is None or trigger["type"] != "Software"
+        notified = 0
+        try:
+            self.conn.send(
+                (
+                    self.backend,
+                    self.buffer.shm.name,
+                    self.read_chans,
+                    self.dtype,
+                    self.get_chunk_size(hz),
+                    hz,
+                    duration,
+                    trigger,
+                )
             )
+            while not self.conn.poll(0.05):
+                if stream:
+                    notified = self.notify_written(notified)
+            sample_rate, error = self.conn.recv()
+            self.notify_written(notified if stream else 0)
+            if error is not None:
+                self.error = AcquisitionError(error)
+                print("Reader stopped: ", error)
+        except (EOFError, OSError) as e:
+            self.error = AcquisitionError("Reader process died: " + str(e))
+            print(self.error)
+        finally:
+            try:
+                self.buffer.shm.unlink()  # our mapping (and arrays handed out of it) stay valid
+            except FileNotFoundError:
+                pass
+            if self.done_callback is not None:
+                self.done_callback()
+
+    # passes the samples the child wrote after the first notified ones on to the chunk listener
+    # returns the number of samples notified so far
+    def notify_written(self, notified):
+        count = self.buffer.count  # the child keeps writing, only hand over what is there now
+        start = max(notified, count - self.buffer.capacity)
+        if self.chunk_listener is not None and count > start:
+            self.chunk_listener(self.buffer.range(start, count))
+        return count
+
+    def start_reader_thread(self, hz, duration, sync=None, trigger=None):
+        if sync is not None:
+            Reader.start_reader_thread(self, hz, duration, sync, trigger)
+            return
+        self.start_process()
+        self.kill = False
+        self.kill_event.clear()
+        self.sample_rate = hz
+        self.read_chans = list(self.ai_chans)
+        total_samples = int(hz * duration)
+        if trigger is not None and trigger["type"] != "Digital Edge":
+            total_samples += int(hz * trigger["pretrigger"])
+        self.buffer = SharedRingBuffer(
+            total_samples, self.dtype, len(self.read_chans), readonly=True
+        )
+        self.reader_thread = threading.Thread(
+            target=self.read_in_process, args=[hz, duration, trigger]
+        )
+        self.reader_thread.start()
 
-            # Configure the sample rate, frequency, and amplitude of the sine wave
-            sample_rate = 2000  # 2 kHz sample rate
-            sine_wave_frequency = 100  # Frequency of the sine wave in Hz
-            amplitude = 5.0  # Amplitude of the sine wave
-
-            # Calculate the number of samples for one cycle of the sine wave
-            samples_per_cycle = int(sample_rate / sine_wave_frequency)
+    def kill_reader_thread(self):
+        self.kill = True
+        self.kill_event.set()
+
+    def close(self):
+        self.kill_reader_thread()
+        if self.process is not None and self.process.is_alive():
+            self.conn.send(None)
+            self.process.join(1.0)
+
+
+# Stimulus settings a test config can set; "N/A" (or a missing key) falls back to these defaults.
+# A signal_shape of "N/A" uses the signal selected in the Output device tab.
+# signal_duty_cycle is the percent of the period a Square wave spends high
+# signal_file is a .csv or .npy file holding one period of an arbitrary ("File") waveform
+DEFAULT_STIMULUS = {
+    "signal_shape": "N/A",
+    "signal_frequency": 100.0,  # hz
+    "signal_amplitude": 5.0,  # volts
+    "signal_offset": 0.0,  # volts
+    "signal_duty_cycle": 50.0,  # percent
+    "signal_sample_rate": 2000.0,  # hz
+    "signal_file": "",
+}
+
+
+# loads one period of an arbitrary waveform from a .npy file or a single column/row .csv file
+def load_waveform_file(path):
+    if path.lower().endswith(".npy"):
+        waveform = np.load(path)
+    else:
+        waveform = np.loadtxt(path, delimiter=",")
+    return np.ravel(waveform).astype(np.float64)
+
+
+# Returns one period of a stimulus waveform as a read-only numpy array.
+# Waveforms are cached by their parameters, so tests in a suite that share a stimulus reuse the same buffer
+# file_mtime is only part of the cache key, so an edited "File" waveform gets reloaded
+@functools.lru_cache(maxsize=32)
+def build_waveform(shape, frequency, amplitude, offset, duty_cycle, sample_rate, path="", file_mtime=0):
+    if shape == "File":
+        waveform = load_waveform_file(path)
+    else:
+        samples_per_cycle = max(int(round(sample_rate / frequency)), 2)
+        phase = np.arange(samples_per_cycle) / samples_per_cycle  # position in the period, [0, 1)
+        if shape == "Sine":
+            waveform = amplitude * np.sin(2 * np.pi * phase)
+        elif shape == "Square":
+            waveform = np.where(phase < duty_cycle / 100, amplitude, -amplitude)
+        elif shape == "Triangle":
+            waveform = amplitude * (1 - 4 * np.abs(phase - 0.5))
+        elif shape == "Sawtooth":
+            waveform = amplitude * (2 * phase - 1)
+        elif shape == "Step":  # four equal stairs up to amplitude
+            waveform = amplitude * (np.floor(phase * 4) + 1) / 4
+        else:
+            raise ValueError("Unknown signal shape: " + str(shape))
+    waveform = waveform + offset
+    waveform.setflags(write=False)  # shared by every test that uses it
+    return waveform
 
-            # Create a sine wave waveform
-            t = np.arange(samples_per_cycle) / sample_rate
-            waveform = amplitude * np.sin(2 * np.pi * sine_wave_frequency * t)
 
-            # Write the sine wave continuously
-            while not self.kill:
-                stream_writer.write_many_sample(waveform)
+# Class that generates thread that will produce a signal on DAQ
+# Each signal is written to the DAQ's output buffer once and regenerated by the device off its own
+# sample clock, so the output doesn't depend on how quickly Python can keep the buffer filled
+class Generator(Daq):
+    def __init__(self, backend=None):
+        self.ao_chan = "Dev1/ao0"  # default channel to produce signal on
+        self.stop_event = threading.Event()  # signal to tell the generator thread to stop
+        self.generator_thread = None
+        self.error = None  # last error raised while generating
+        self.signals = ["Sine", "Step", "Square", "Triangle", "Sawtooth", "File"]
+        self.currSignal = self.signals[0]  # shape used when a test doesn't set signal_shape
+        self.stimulus = dict(DEFAULT_STIMULUS)  # settings of the test currently being run
+        self.running_stimulus = None  # resolved settings of the signal being generated
+        self.running_mtime = 0  # modification time of its waveform file (see get_file_mtime)
+        self.synchronized = False  # True if the output waits for a synchronized reader to start it
+        self.output_task = None  # output task of a synchronized generator, once it is written
+        self.output_ready = threading.Event()  # set when output_task is ready to be started
+        self.output_release = threading.Event()  # set by the reader once its input is armed
+        Daq.__init__(self, backend)
+
+    # function to write a waveform to the DAQ once and have the device loop it until the generator is killed
+    # input: waveform - numpy array of voltages for one period, sample_rate - output rate in hz
+    # output: waveform regenerated on the analog out channel
+    def regenerate(self, waveform, sample_rate):
+        self.error = None
+        try:
+            with self.backend.open_output(self.ao_chan, waveform, sample_rate) as task:
+                if self.synchronized:
+                    # hand the task to the reader and wait until its input is armed on our clock
+                    self.output_task = task
+                    self.output_ready.set()
+                    while not self.output_release.wait(0.05):
+                        if self.stop_event.is_set():
+                            return
+                task.start()
+                self.stop_event.wait()  # the device loops the buffer, nothing to do until killed
+                task.stop()
+        except AcquisitionError as e:
+            self.error = e
+            print("Generator stopped: ", e)
+        finally:
+            self.output_task = None
+            self.output_ready.clear()
+
+    # called by a synchronized reader; returns the output task to slave the input to (None if it never came up)
+    def wait_for_output(self, timeout=5.0):
+        if not self.output_ready.wait(timeout):
+            return None
+        return self.output_task
+
+    # called by a synchronized reader once its input is armed; starts the output
+    def release_output(self):
+        self.output_release.set()
+
+    # returns the length in seconds of one period of the current stimulus
+    def get_period(self):
+        stimulus = self.resolve_stimulus()
+        return len(self.get_waveform(stimulus)) / float(stimulus["signal_sample_rate"])
+
+    # returns the stimulus settings that will actually be generated (defaults filled in, shape resolved)
+    def resolve_stimulus(self):
+        stimulus = dict(self.stimulus)
+        if stimulus["signal_shape"] == "N/A":
+            stimulus["signal_shape"] = self.currSignal
+        return stimulus
+
+    # returns the modification time of the waveform file of a resolved "File" stimulus, 0 for the other shapes
+    # or a file that is gone (building its waveform then fails)
+    def get_file_mtime(self, stimulus):
+        if stimulus["signal_shape"] != "File":
+            return 0
+        try:
+            return os.path.getmtime(stimulus["signal_file"])
+        except OSError:
+            return 0
+
+    # returns one period of the waveform for the given resolved stimulus from the waveform cache
+    def get_waveform(self, stimulus):
+        return build_waveform(
+            stimulus["signal_shape"],
+            float(stimulus["signal_frequency"]),
+            float(stimulus["signal_amplitude"]),
+            float(stimulus["signal_offset"]),
+            float(stimulus["signal_duty_cycle"]),
+            float(stimulus["signal_sample_rate"]),
+            stimulus["signal_file"],
+            self.get_file_mtime(stimulus),
+        )
+
+    # function to produce the current stimulus on the DAQ out channel
+    # input: stimulus - resolved stimulus settings
+    # output: the stimulus waveform regenerated on the analog out channel
+    def stimulus_gen(self, stimulus):
+        try:
+            waveform = self.get_waveform(stimulus)
+        except (OSError, ValueError) as e:
+            self.error = e
+            print("Could not build waveform: ", e)
+            return
+        self.regenerate(waveform, float(stimulus["signal_sample_rate"]))
 
     # Sets the output channel that the thread will read on
     def set_ao_channel(self, chan):
         self.ao_chan = chan
 
-    # Returns a list of all available signal functions
+    # Returns a list of all available signal shapes
     def get_signals(self):
-        return self.signals.keys()
+        return self.signals
 
-    # Sets the signal type to generate
+    # Sets the signal shape to generate when a test doesn't set one
     def set_signal(self, signal):
         self.currSignal = signal
 
-    # spawns a thread for generating on daq
+    # Sets the stimulus settings from a test config; settings that are "N/A" or missing use DEFAULT_STIMULUS
+    # Raises ValueError (keeping the previous stimulus) if the waveform can't be built from the settings
+    def set_stimulus(self, testDict):
+        stimulus = dict(DEFAULT_STIMULUS)
+        for key in DEFAULT_STIMULUS:
+            if testDict.get(key, "N/A") not in ("N/A", ""):
+                stimulus[key] = testDict[key]
+        shape = stimulus["signal_shape"] if stimulus["signal_shape"] != "N/A" else self.currSignal
+        if float(stimulus["signal_sample_rate"]) <= 0:
+            raise ValueError("Stimulus sample rate must be greater than 0")
+        if shape == "File":
+            if not os.path.isfile(stimulus["signal_file"]):
+                raise ValueError("File stimulus needs a waveform file, not found: " + repr(stimulus["signal_file"]))
+        elif float(stimulus["signal_frequency"]) <= 0:
+            raise ValueError("Stimulus frequency must be greater than 0")
+        self.stimulus = stimulus
+
+    # Sets the stimulus for the next test, restarting the generator only if it isn't running freely already
+    # or the signal actually changes (including a "File" waveform edited on disk since it was started)
+    def update_stimulus(self, testDict):
+        self.set_stimulus(testDict)
+        running = self.generator_thread is not None and self.generator_thread.is_alive()
+        if (
+            not running
+            or self.synchronized
+            or self.resolve_stimulus() != self.running_stimulus
+            or self.get_file_mtime(self.running_stimulus) != self.running_mtime
+        ):
+            self.start_generator_thread()
+
+    # spawns a thread for generating on daq (stopping any signal that is already being generated)
+    # input: synchronized - if True the output is only started by a reader given this generator as sync
     # output: a running thread for generating a signal
-    def start_generator_thread(self):
-        self.kill = False
-        thread_two = threading.Thread(target=self.signals[self.currSignal])
-        thread_two.start()
+    def start_generator_thread(self, synchronized=False):
+        self.kill_generator_thread()
+        self.join_generator_thread()
+        self.stop_event.clear()
+        self.output_release.clear()
+        self.synchronized = synchronized
+        self.running_stimulus = self.resolve_stimulus()
+        self.running_mtime = self.get_file_mtime(self.running_stimulus)
+        self.generator_thread = threading.Thread(
+            target=self.stimulus_gen, args=[self.running_stimulus]
+        )
+        self.generator_thread.start()
 
     # kills all generator threads
     def kill_generator_thread(self):
-        self.kill = True
+        self.stop_event.set()
+
+    # waits for the generator thread to stop its task and exit
+    def join_generator_thread(self, timeout=None):
+        if self.generator_thread is not None:
+            self.generator_thread.join(timeout)
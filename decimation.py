@@ -0,0 +1,50 @@
+import numpy as np
+
+
+# Min/max decimation pyramid of a capture, for plotting captures far longer than the screen is wide
+# Level k holds the minimum and maximum of every bin of base_bin * factor**(k-1) samples (level 0 is the
+# capture itself). A view of any part of the capture is drawn from the coarsest level that still has a bin per
+# pixel, as the min and max of each bin, so the line keeps every spike and never has more than ~2 points per
+# pixel however long the capture is
+# data - 1-D capture, base_bin - samples per bin of level 1, factor - bins of a level merged into one of the next
+class MinMaxPyramid:
+    def __init__(self, data, base_bin=4, factor=4):
+        self.data = np.asarray(data)
+        self.bin_sizes = [1]
+        self.mins = [self.data]
+        self.maxs = [self.data]
+        bin_size = base_bin
+        mins, maxs, merge = self.data, self.data, base_bin
+        while len(mins) > merge:
+            starts = np.arange(0, len(mins), merge)
+            mins = np.minimum.reduceat(mins, starts)
+            maxs = np.maximum.reduceat(maxs, starts)
+            self.bin_sizes.append(bin_size)
+            self.mins.append(mins)
+            self.maxs.append(maxs)
+            bin_size *= factor
+            merge = factor
+
+    def __len__(self):
+        return len(self.data)
+
+    # returns (x, y) for a line showing samples start to end (sample indices, clipped to the capture) using at
+    # most about max_bins bins, i.e. 2 * max_bins points; x is in samples
+    def query(self, start, end, max_bins):
+        start = max(int(np.floor(start)), 0)
+        end = min(int(np.ceil(end)) + 1, len(self.data))
+        if end <= start:
+            return np.zeros(0), np.zeros(0)
+        level = 0
+        while level + 1 < len(self.bin_sizes) and (end - start) / self.bin_sizes[level] > max_bins:
+            level += 1
+        bin_size = self.bin_sizes[level]
+        if bin_size == 1:
+            return np.arange(start, end), self.data[start:end]
+        first = start // bin_size
+        last = -(-end // bin_size)  # bins partly in view are drawn whole
+        x = (np.arange(first, last) + 0.5) * bin_size - 0.5  # bin centres
+        y = np.empty(2 * (last - first), dtype=self.mins[level].dtype)
+        y[0::2] = self.mins[level][first:last]
+        y[1::2] = self.maxs[level][first:last]
+        return np.repeat(x, 2), y
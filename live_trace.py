@@ -0,0 +1,169 @@
+import math
+import numpy as np
+
+from PySide6.QtCore import QPointF, QRectF, Qt
+from PySide6.QtGui import QColor, QPainter, QPen, QPolygonF
+from PySide6.QtWidgets import QWidget
+
+
+# Returns (x, y) of a line through samples drawn across width pixels (x in samples)
+# Once there are more than two samples per pixel each pixel gets the min and max of the samples under it, so
+# spikes are kept and the line never has more than 2 * width points
+def decimate(samples, width):
+    n = len(samples)
+    if n <= 2 * width:
+        return np.arange(n), samples
+    edges = (np.arange(width) * n) // width
+    x = np.repeat(edges + 0.5 * n / width, 2)
+    y = np.empty(2 * width, dtype=samples.dtype)
+    y[0::2] = np.minimum.reduceat(samples, edges)
+    y[1::2] = np.maximum.reduceat(samples, edges)
+    return x, y
+
+
+# returns a round tick spacing (1, 2 or 5 times a power of ten) that splits span into about ticks parts
+def tick_step(span, ticks=6):
+    raw = span / ticks
+    magnitude = 10 ** math.floor(math.log10(raw))
+    for multiple in (1, 2, 5, 10):
+        if multiple * magnitude >= raw:
+            return multiple * magnitude
+    return 10 * magnitude
+
+
+# Live view of the newest samples of a Reader, painted straight onto the widget with QPainter
+# The line is decimated to the widget's width, so a repaint costs the same however many points are shown.
+# The y axis grows to fit the signal (reset_scale() or a new capture shrinks it again).
+# Modes:
+#   "scroll" - the newest sample is always at the right edge and the time axis scrolls with it
+#   "strip" - strip chart: the line is swept left to right over a fixed time axis, overwriting the previous
+#             sweep, with a small gap after the newest sample
+# reader - Reader whose first channel is shown, points - samples across the widget
+class TraceWidget(QWidget):
+    MODES = ["scroll", "strip"]
+    MARGINS = (60, 10, 10, 25)  # left, top, right, bottom (pixels) around the plot for the axis labels
+
+    def __init__(self, reader, points=2000, mode="scroll", parent=None):
+        super(TraceWidget, self).__init__(parent)
+        self.reader = reader
+        self.points = max(int(points), 2)
+        self.mode = mode
+        self.yRange = None  # (low, high) of the y axis, None until there is data
+        self.lastCount = 0  # samples read when last painted, a smaller count means a new capture
+        self.setMinimumHeight(150)
+
+    def set_mode(self, mode):
+        self.mode = mode
+        self.update()
+
+    # lets the y axis shrink to the next samples painted
+    def reset_scale(self):
+        self.yRange = None
+        self.update()
+
+    # grows the y range to fit samples, with some headroom
+    def fit(self, samples):
+        low = float(np.min(samples))
+        high = float(np.max(samples))
+        if self.yRange is not None:
+            if low >= self.yRange[0] and high <= self.yRange[1]:
+                return
+            low = min(low, self.yRange[0])
+            high = max(high, self.yRange[1])
+        margin = 0.1 * (high - low) if high > low else 0.5
+        self.yRange = (low - margin, high + margin)
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), Qt.white)
+        left, top, right, bottom = TraceWidget.MARGINS
+        plot = QRectF(self.rect()).adjusted(left, top, -right, -bottom)
+        if plot.width() < 2 or plot.height() < 2:
+            painter.end()
+            return
+        count = self.reader.getCurrDataSize()
+        rate = self.reader.sample_rate
+        if count < self.lastCount:  # a new capture started
+            self.yRange = None
+        self.lastCount = count
+        # count is every sample read, the buffer may hold fewer (i.e. a software trigger's ring)
+        samples = self.reader.getEndArray(self.points)
+        n = len(samples)
+        if n > 0:
+            self.fit(samples)
+        low, high = self.yRange if self.yRange is not None else (-1.0, 1.0)
+        if self.mode == "strip":
+            sweep_start = count - count % self.points  # first sample of the current sweep
+            self.draw_axes(painter, plot, sweep_start / rate, self.points / rate, low, high)
+        else:
+            self.draw_axes(painter, plot, (count - self.points) / rate, self.points / rate, low, high)
+
+        painter.setClipRect(plot)
+        painter.setRenderHint(QPainter.Antialiasing, False)
+        painter.setPen(QPen(QColor("red"), 1))
+        if self.mode == "strip":
+            current = min(count - sweep_start, n)
+            older = n - current
+            # the current sweep from the left edge, what is left of the previous sweep after a gap
+            self.draw_segment(painter, plot, samples[older:], 0, low, high)
+            gap = min(max(self.points // 50, 1), older)
+            self.draw_segment(
+                painter,
+                plot,
+                samples[gap:older],
+                count - n - sweep_start + self.points + gap,
+                low,
+                high,
+            )
+        else:
+            self.draw_segment(painter, plot, samples, self.points - n, low, high)
+        painter.end()
+
+    # draws samples as a polyline starting first samples from the left edge of plot
+    def draw_segment(self, painter, plot, samples, first, low, high):
+        if len(samples) < 2:
+            return
+        width = max(int(plot.width() * len(samples) / self.points), 1)
+        x, y = decimate(samples, width)
+        px = plot.left() + (first + x) * plot.width() / (self.points - 1)
+        py = plot.bottom() - (y - low) * plot.height() / (high - low)
+        painter.drawPolyline(
+            QPolygonF([QPointF(a, b) for a, b in zip(px.tolist(), py.tolist())])
+        )
+
+    # draws the frame, grid and tick labels of a plot showing times t0 to t0 + span (s) and volts low to high
+    def draw_axes(self, painter, plot, t0, span, low, high):
+        grid = QPen(QColor("#DEE2E6"), 1)
+        text = QPen(QColor("black"), 1)
+        metrics = painter.fontMetrics()
+
+        step = tick_step(high - low)
+        value = math.ceil(low / step) * step
+        while value <= high:
+            y = plot.bottom() - (value - low) * plot.height() / (high - low)
+            painter.setPen(grid)
+            painter.drawLine(QPointF(plot.left(), y), QPointF(plot.right(), y))
+            painter.setPen(text)
+            label = "%g" % round(value, 9)
+            painter.drawText(
+                QPointF(plot.left() - metrics.horizontalAdvance(label) - 4, y + metrics.ascent() / 2),
+                label,
+            )
+            value += step
+
+        step = tick_step(span)
+        time = math.ceil(t0 / step) * step
+        while time <= t0 + span:
+            x = plot.left() + (time - t0) * plot.width() / span
+            painter.setPen(grid)
+            painter.drawLine(QPointF(x, plot.top()), QPointF(x, plot.bottom()))
+            painter.setPen(text)
+            label = "%g s" % round(time, 9)
+            painter.drawText(
+                QPointF(x - metrics.horizontalAdvance(label) / 2, plot.bottom() + metrics.ascent() + 4),
+                label,
+            )
+            time += step
+
+        painter.setPen(text)
+        painter.drawRect(plot)
@@ -0,0 +1,123 @@
+import json
+import profig
+
+
+# Qt-free pieces of loading a project and running its tests, shared by app.py and cli.py
+# A project is a profig config file (i.e. default.cfg) holding test_list (names of the configured tests),
+# test_suite (test names in the order the suite runs them) and a section_test.<name> JSON dict per test
+
+
+# Opens (creating if needed) the project config file filename, with the test list and suite initialised
+def open_config(filename):
+    cfg = profig.Config(filename)
+    # splitList = lambda x: list(x.split(","))
+    # listToStr = lambda x: ",".join(x)
+    # dictToStr = lambda x: json.dumps(x)
+    # splitDict = lambda x: json.loads(x)
+    # cfg.coercer.register(list, lambda x: ",".join(x), lambda x: list(x.split(",")))
+    cfg.coercer.register(
+        dict, lambda x: json.dumps(x), lambda x: json.loads(x)
+    )  # dict coercer does not work so string conversion/deconversion is needed when using dicts with the config file
+    cfg.init("test_list", [], list)
+    cfg.init("test_suite", [], list)
+    cfg.sync()
+    return cfg
+
+
+# Returns (test_list, test_suite, configured_tests) of an open project config, configured_tests being the
+# config dict of each test in test_list
+def load_tests(cfg):
+    test_list = cfg["test_list"]
+    test_suite = cfg["test_suite"]
+    configured_tests = [json.loads(cfg["section_test." + x]) for x in test_list]
+    return test_list, test_suite, configured_tests
+
+
+# returns the row of a capture of channels that holds the test's analysis channel
+def get_analysis_row(testDict, channels):
+    channel = testDict.get("analysis_channel", "N/A")
+    return channels.index(channel) if channel in channels else 0
+
+
+# returns the trigger (see Reader.read) the test's capture waits for, or None to record straight away
+# test_duration is then the time recorded after the trigger
+# channels - the channels the reader samples, the default source of an analog trigger is the first of them
+# Raises ValueError for a digital trigger without a source, an analog channel is never a digital terminal
+def get_trigger(testDict, channels):
+    trigger_type = testDict.get("trigger_type", "N/A")
+    if trigger_type == "N/A":
+        return None
+    source = testDict.get("trigger_source", "N/A")
+    if trigger_type == "Digital Edge" and source == "N/A":
+        raise ValueError(
+            testDict["name"] + ": a Digital Edge trigger needs a source terminal (i.e. /Dev1/PFI0)"
+        )
+    level = testDict.get("trigger_level", "N/A")
+    pretrigger = testDict.get("pretrigger_time", "N/A")
+    timeout = testDict.get("trigger_timeout", "N/A")
+    return {
+        "type": trigger_type,
+        "source": source if source != "N/A" else channels[0],
+        "level": level if level != "N/A" else 0.0,
+        "slope": testDict.get("trigger_slope", "Rising"),
+        "pretrigger": pretrigger if pretrigger != "N/A" else 0.0,
+        "timeout": timeout if timeout != "N/A" else 10.0,
+    }
+
+
+# Starts the stimulus and the reader thread for one test; the capture is complete once the reader's
+# done callback is called (or join_reader_thread() returns)
+# Raises ValueError (before anything is started) if the test's settings can't be run, i.e. a synchronized
+# test whose sample rate isn't the stimulus sample rate
+def start_capture(reader, generator, testDict):
+    test_duration = testDict[
+        "test_duration"
+    ]  # get specifcally the test duration from test config
+    sampleRate = testDict["sample_rate"]  # get the sample rate from config
+    trigger = get_trigger(testDict, reader.ai_chans)
+    if testDict.get("synchronized", False):
+        # the AI runs off the AO sample clock and start trigger, so the stimulus restarts with every
+        # capture and sample 0 of the capture is sample 0 of the stimulus
+        generator.set_stimulus(testDict)
+        stimulusRate = generator.resolve_stimulus()["signal_sample_rate"]
+        if sampleRate != stimulusRate:
+            # the steps convert samples to time with the test's sample rate, so they would be scaled wrong
+            raise ValueError(
+                testDict["name"]
+                + ": a synchronized capture runs at the stimulus sample rate ("
+                + str(stimulusRate)
+                + " hz), set the test's sample rate to match"
+            )
+        generator.start_generator_thread(synchronized=True)
+        capture_periods = testDict.get("capture_periods", "N/A")
+        if capture_periods != "N/A":  # capture a whole number of stimulus periods
+            test_duration = capture_periods * generator.get_period()
+        if trigger is not None:
+            print("Synchronized capture starts with the stimulus, the test's trigger is ignored")
+        reader.start_reader_thread(sampleRate, test_duration, sync=generator)
+    else:
+        generator.update_stimulus(
+            testDict
+        )  # only restarts the generator if this test uses a different stimulus
+        reader.start_reader_thread(
+            sampleRate, test_duration, trigger=trigger
+        )  # set reader thread with test sample rate
+
+
+# Returns the results entry of a test (see Analysis.updateResults in app.py) from its step results and the
+# StreamingAnalyzer that ran on its capture
+# error - the AcquisitionError the capture ended with (see Reader.error), if any; the capture is then short or
+#         incomplete, so the test fails whatever its steps measured
+def test_results(test_name, step_list, streamer, error=None):
+    results = {"test_name": test_name, "test_passed": True, "results": []}
+    for step in step_list:
+        results["results"].append(step)
+        if step["status"] == False:
+            results["test_passed"] = False
+    if streamer.aborted:
+        results["aborted"] = True
+        results["test_passed"] = False
+    if error is not None:
+        results["error"] = str(error)
+        results["test_passed"] = False
+    return results
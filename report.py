@@ -1,17 +1,8 @@
-import json
-import os
-from datetime import datetime
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Table, TableStyle
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib.units import inch
-from reportlab.lib import colors
-from reportlab.lib.enums import TA_LEFT, TA_CENTER, TA_RIGHT, TA_JUSTIFY
+from report_writer import create_header, write_json, write_pdf
 
 from PySide6.QtCore import *
 from PySide6.QtGui import *
 from PySide6.QtWidgets import *
-from PySide6.QtWebEngineWidgets import QWebEngineView
 
 
 class ReportPreview(QWidget):
@@ -24,8 +15,8 @@ class ReportPreview(QWidget):
         self.testList = self.parent().testList
         self.testSuite = self.parent().testSuite
         self.configuredTests = self.parent().configuredTests
-        self.parent().comm.testDone.connect(self._setValues)
-        self.webView = self.parent().webView
+        self.parent().comm.analysisDone.connect(self._setValues)
+        self.webView = None  # PDF viewer, created when the tab is first shown (see getWebView)
         self.results = self.parent().results
         self.name = QLineEdit()
         self.custom_field_title = QLineEdit()
@@ -55,54 +46,54 @@ class ReportPreview(QWidget):
         formWidget = QWidget()
         formWidget.setLayout(form)
 
-        self.webView.settings().setAttribute(
-            self.webView.settings().WebAttribute.PluginsEnabled, True
-        )
-        self.webView.settings().setAttribute(
-            self.webView.settings().WebAttribute.PdfViewerEnabled, True
-        )
-
         tabs = QTabWidget()
         tabs.setTabPosition(QTabWidget.TabPosition.North)
         tabs.setMovable(True)
         tabs.addTab(formWidget, "Report Parameters")
 
         outerLayout = QHBoxLayout()
-        mainGrid = QVBoxLayout()  # grey4
-        mainGrid.addWidget(self.webView)
+        self.mainGrid = QVBoxLayout()  # grey4
         rightPane = QVBoxLayout()  # grey3
         rightPane.addWidget(tabs)
-        outerLayout.addLayout(mainGrid, 3.5)
+        outerLayout.addLayout(self.mainGrid, 3.5)
         outerLayout.addLayout(rightPane, 1)
         self.setLayout(outerLayout)
 
+    def showEvent(self, event):
+        super(ReportPreview, self).showEvent(event)
+        self.getWebView()
+
+    # Returns the QWebEngineView the PDF is shown in, creating it the first time
+    # Qt WebEngine takes a while to import and start, so it's left until the tab is used
+    def getWebView(self):
+        if self.webView is None:
+            from PySide6.QtWebEngineWidgets import QWebEngineView
+
+            self.webView = QWebEngineView()
+            self.webView.settings().setAttribute(
+                self.webView.settings().WebAttribute.PluginsEnabled, True
+            )
+            self.webView.settings().setAttribute(
+                self.webView.settings().WebAttribute.PdfViewerEnabled, True
+            )
+            self.webView.setUrl(QUrl(""))
+            self.mainGrid.addWidget(self.webView)
+        return self.webView
+
     # Returns dict holding the general report info
     def createHeader(self):
-        num_tests_passed = 0
-        for dict in self.results:
-            if dict["test_passed"]:
-                num_tests_passed += 1
-        overall_pass = (
-            True if num_tests_passed >= int(self.passing_threshold.text()) else False
+        return create_header(
+            self.results,
+            self.name.text(),
+            self.passing_threshold.text(),
+            self.custom_field_title.text(),
+            self.custom_field_text.text(),
         )
-        header = {
-            "report_name": self.name.text(),
-            self.custom_field_title.text(): self.custom_field_text.text(),
-            "date_and_time": datetime.now().strftime("%m/%d/%Y %H:%M:%S"),
-            # "execution_time":
-            "tests_passed": str(num_tests_passed) + "/" + str(len(self.results)),
-            "passing_threshold": self.passing_threshold.text(),
-            "result": overall_pass,
-        }
-        return header
 
     # Connected to self.generate_json button. Chooses json file to export report to.
     def generateJSON(self):
         header = self.createHeader()
 
-        data = {"report_header": header, "test_sequence": self.results}
-        json_object = json.dumps(data, indent=4)
-
         dialog = QFileDialog(self)
         dialog.setFileMode(QFileDialog.AnyFile)
         dialog.setViewMode(QFileDialog.Detail)
@@ -112,129 +103,12 @@ class ReportPreview(QWidget):
         if dialog.exec():
             filenames = dialog.selectedFiles()
 
-        with open(filenames[0], "w") as outfile:
-            outfile.write(json_object)
+        write_json(filenames[0], header, self.results)
         print("JSON exported to ", filenames[0])
 
-    # Return as a string after checking if input is N/A
-    def checkNA(self, text):
-        text = str(text)
-        if text != "N/A":
-            return text
-        else:
-            return ""
-
     # Connected to self.generate_pdf button. Chooses pdf file to export report to. Sets self.webView to generated pdf.
     def generatePDF(self):
-        styles = getSampleStyleSheet()
-        # styles.list()
-        heading1Style = styles["Heading1"]
-        heading1Style.alignment = TA_CENTER
-        heading2Style = styles["Heading2"]
-        heading2Style.alignment = TA_LEFT
-        heading3Style = styles["Heading3"]
-        heading3Style.alignment = TA_LEFT
-        normalStyle = styles["Normal"]
-
-        # Table for general report info
         header = self.createHeader()
-        heading1 = Paragraph(header["report_name"], style=styles["Heading1"])
-        # headingTestStatus = Paragraph("Test Status", style=styles["Heading2"])
-        headingTestSequence = Paragraph("Test Sequence", style=styles["Heading2"])
-        reportData = [
-            ["Date and Time", header["date_and_time"]],
-            # ["Execution time", ""],
-            ["Tests passed", header["tests_passed"]],
-            ["Passing threshold", header["passing_threshold"]],
-            ["Result", ("Passed" if header["result"] else "Failed")],
-        ]
-        if self.custom_field_title.text() != "":
-            reportData.insert(
-                0, [self.custom_field_title.text(), self.custom_field_text.text()]
-            )
-        reportStyle = TableStyle(
-            [
-                ("FONTNAME", (0, 0), (0, -1), "Helvetica-Bold"),
-                ("GRID", (0, 0), (-1, -1), 0.25, colors.black),
-            ]
-        )
-        cellColor = colors.green if header["result"] else colors.red
-        reportStyle.add("BACKGROUND", (1, 3), (1, 3), cellColor)
-        reportTable = Table(reportData, style=reportStyle, hAlign="CENTER")
-        flowables = []
-        flowables.append(heading1)
-        flowables.append(reportTable)
-        # flowables.append(headingTestStatus)
-
-        testStatusData = [["Test", "Result"]]
-        for dict in self.results:
-            testStatusData.append(
-                [dict["test_name"], ("Passed" if dict["test_passed"] else "Failed")]
-            )
-        testStatusStyle = TableStyle(
-            [
-                ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-                ("GRID", (0, 0), (-1, -1), 0.25, colors.black),
-            ]
-        )
-        for row in range(1, len(testStatusData)):
-            cellColor = colors.white
-            if testStatusData[row][1] == "Passed":
-                cellColor = colors.green
-            elif testStatusData[row][1] == "Failed":
-                cellColor = colors.red
-            testStatusStyle.add("BACKGROUND", (1, row), (1, row), cellColor)
-        testStatusTable = Table(testStatusData, style=testStatusStyle, hAlign="CENTER")
-        flowables.append(testStatusTable)
-
-        flowables.append(headingTestSequence)
-        # Makes a table detailing the steps of each test
-        for dict in self.results:
-            headingText = (
-                dict["test_name"]
-                + " - "
-                + ("Passed" if dict["test_passed"] else "Failed")
-            )
-            headingTest = Paragraph(headingText, style=styles["Heading3"])
-            testData = [
-                ["Step", "Status", "Measurement", "Units", "Limits", ""],
-                ["", "", "", "", "Low Limit", "High Limit"],
-            ]
-            for idict in dict["results"]:
-                if idict["step_name"] != "find_peaks":
-                    testData.append(
-                        [
-                            idict["step_name"],
-                            ("Passed" if idict["status"] else "Failed"),
-                            Paragraph(
-                                self.checkNA(idict["measurement"]),
-                                style=styles["Normal"],
-                            ),
-                            self.checkNA(idict["units"]),
-                            self.checkNA(idict["low_limit"]),
-                            self.checkNA(idict["high_limit"]),
-                        ]
-                    )
-            testStyle = TableStyle(
-                [
-                    ("FONTNAME", (0, 0), (-1, 1), "Helvetica-Bold"),
-                    ("GRID", (0, 0), (-1, -1), 0.25, colors.black),
-                    ("SPAN", (-2, 0), (-1, 0)),
-                    ("ALIGN", (-2, 0), (-1, 0), "CENTER"),
-                ]
-            )
-            for i in range(0, 4):
-                testStyle.add("SPAN", (i, 0), (i, 1))
-            for row in range(2, len(testData)):
-                cellColor = colors.white
-                if testData[row][1] == "Passed":
-                    cellColor = colors.green
-                elif testData[row][1] == "Failed":
-                    cellColor = colors.red
-                testStyle.add("BACKGROUND", (1, row), (1, row), cellColor)
-            testTable = Table(testData, style=testStyle, hAlign="CENTER")
-            flowables.append(headingTest)
-            flowables.append(testTable)
 
         dialog = QFileDialog(self)
         dialog.setFileMode(QFileDialog.AnyFile)
@@ -245,21 +119,12 @@ class ReportPreview(QWidget):
         if dialog.exec():
             filenames = dialog.selectedFiles()
 
-        margin = 1 * inch
-        doc = SimpleDocTemplate(
-            filenames[0],
-            pagesize=letter,
-            rightMargin=margin,
-            leftMargin=margin,
-            topMargin=margin,
-            bottomMargin=margin,
-        )
-        doc.build(flowables)
+        write_pdf(filenames[0], header, self.results, self.custom_field_title.text())
 
-        self.webView.load(QUrl(f"file:///{filenames[0]}"))
+        self.getWebView().load(QUrl(f"file:///{filenames[0]}"))
         print("PDF exported to ", filenames[0])
 
-    # Enables buttons when test suite finishes
+    # Enables buttons when the results of the test suite have been analysed
     def _setValues(self):
         self.testDone = True
         self.generate_json.setEnabled(True)
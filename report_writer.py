@@ -0,0 +1,194 @@
+import json
+import numpy as np
+from datetime import datetime
+from xml.sax.saxutils import escape
+
+
+# Qt-free report writing, used by the Report Preview tab (report.py) and cli.py
+# results - the results of a test suite, a dict per test (see Analysis.updateResults in app.py)
+
+
+# Returns dict holding the general report info
+# custom_title/custom_text - the report's custom field, a row of the header
+def create_header(results, report_name, passing_threshold, custom_title="", custom_text=""):
+    num_tests_passed = 0
+    for dict in results:
+        if dict["test_passed"]:
+            num_tests_passed += 1
+    overall_pass = True if num_tests_passed >= int(passing_threshold) else False
+    header = {
+        "report_name": report_name,
+        custom_title: custom_text,
+        "date_and_time": datetime.now().strftime("%m/%d/%Y %H:%M:%S"),
+        # "execution_time":
+        "tests_passed": str(num_tests_passed) + "/" + str(len(results)),
+        "passing_threshold": str(passing_threshold),
+        "result": overall_pass,
+    }
+    return header
+
+
+# json.dumps default for the numpy arrays and scalars in step results (i.e. the peaks found by find_peaks)
+def to_json(value):
+    if isinstance(value, (np.ndarray, np.generic)):
+        return value.tolist()
+    raise TypeError("Object of type " + type(value).__name__ + " is not JSON serializable")
+
+
+# Writes the report as JSON to filename
+def write_json(filename, header, results):
+    data = {"report_header": header, "test_sequence": results}
+    json_object = json.dumps(data, indent=4, default=to_json)
+    with open(filename, "w") as outfile:
+        outfile.write(json_object)
+
+
+# Return as a string after checking if input is N/A
+def check_na(text):
+    text = str(text)
+    if text != "N/A":
+        return text
+    else:
+        return ""
+
+
+# Returns the reasons a test failed besides its steps, from the "aborted" and "error" entries of its results
+def failure_reasons(test):
+    reasons = []
+    if test.get("aborted", False):
+        reasons.append("Capture stopped early, a limit was already failed")
+    if "error" in test:
+        reasons.append("Error: " + test["error"])
+    return reasons
+
+
+# Writes the report as a PDF to filename
+# custom_title - title of the header's custom field ("" if it has none)
+def write_pdf(filename, header, results, custom_title=""):
+    # reportlab is slow to import, so it's only loaded once a PDF is written
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Table, TableStyle
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib.units import inch
+    from reportlab.lib import colors
+    from reportlab.lib.enums import TA_LEFT, TA_CENTER
+
+    styles = getSampleStyleSheet()
+    # styles.list()
+    heading1Style = styles["Heading1"]
+    heading1Style.alignment = TA_CENTER
+    heading2Style = styles["Heading2"]
+    heading2Style.alignment = TA_LEFT
+    heading3Style = styles["Heading3"]
+    heading3Style.alignment = TA_LEFT
+
+    # Table for general report info
+    heading1 = Paragraph(header["report_name"], style=styles["Heading1"])
+    # headingTestStatus = Paragraph("Test Status", style=styles["Heading2"])
+    headingTestSequence = Paragraph("Test Sequence", style=styles["Heading2"])
+    reportData = [
+        ["Date and Time", header["date_and_time"]],
+        # ["Execution time", ""],
+        ["Tests passed", header["tests_passed"]],
+        ["Passing threshold", header["passing_threshold"]],
+        ["Result", ("Passed" if header["result"] else "Failed")],
+    ]
+    if custom_title != "":
+        reportData.insert(0, [custom_title, header[custom_title]])
+    reportStyle = TableStyle(
+        [
+            ("FONTNAME", (0, 0), (0, -1), "Helvetica-Bold"),
+            ("GRID", (0, 0), (-1, -1), 0.25, colors.black),
+        ]
+    )
+    cellColor = colors.green if header["result"] else colors.red
+    reportStyle.add("BACKGROUND", (1, 3), (1, 3), cellColor)
+    reportTable = Table(reportData, style=reportStyle, hAlign="CENTER")
+    flowables = []
+    flowables.append(heading1)
+    flowables.append(reportTable)
+    # flowables.append(headingTestStatus)
+
+    testStatusData = [["Test", "Result"]]
+    for dict in results:
+        testStatusData.append(
+            [dict["test_name"], ("Passed" if dict["test_passed"] else "Failed")]
+        )
+    testStatusStyle = TableStyle(
+        [
+            ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+            ("GRID", (0, 0), (-1, -1), 0.25, colors.black),
+        ]
+    )
+    for row in range(1, len(testStatusData)):
+        cellColor = colors.white
+        if testStatusData[row][1] == "Passed":
+            cellColor = colors.green
+        elif testStatusData[row][1] == "Failed":
+            cellColor = colors.red
+        testStatusStyle.add("BACKGROUND", (1, row), (1, row), cellColor)
+    testStatusTable = Table(testStatusData, style=testStatusStyle, hAlign="CENTER")
+    flowables.append(testStatusTable)
+
+    flowables.append(headingTestSequence)
+    # Makes a table detailing the steps of each test
+    for dict in results:
+        headingText = (
+            dict["test_name"]
+            + " - "
+            + ("Passed" if dict["test_passed"] else "Failed")
+        )
+        headingTest = Paragraph(headingText, style=styles["Heading3"])
+        testData = [
+            ["Step", "Status", "Measurement", "Units", "Limits", ""],
+            ["", "", "", "", "Low Limit", "High Limit"],
+        ]
+        for idict in dict["results"]:
+            if idict["step_name"] != "find_peaks":
+                testData.append(
+                    [
+                        idict["step_name"],
+                        ("Passed" if idict["status"] else "Failed"),
+                        Paragraph(
+                            check_na(idict["measurement"]),
+                            style=styles["Normal"],
+                        ),
+                        check_na(idict["units"]),
+                        check_na(idict["low_limit"]),
+                        check_na(idict["high_limit"]),
+                    ]
+                )
+        testStyle = TableStyle(
+            [
+                ("FONTNAME", (0, 0), (-1, 1), "Helvetica-Bold"),
+                ("GRID", (0, 0), (-1, -1), 0.25, colors.black),
+                ("SPAN", (-2, 0), (-1, 0)),
+                ("ALIGN", (-2, 0), (-1, 0), "CENTER"),
+            ]
+        )
+        for i in range(0, 4):
+            testStyle.add("SPAN", (i, 0), (i, 1))
+        for row in range(2, len(testData)):
+            cellColor = colors.white
+            if testData[row][1] == "Passed":
+                cellColor = colors.green
+            elif testData[row][1] == "Failed":
+                cellColor = colors.red
+            testStyle.add("BACKGROUND", (1, row), (1, row), cellColor)
+        testTable = Table(testData, style=testStyle, hAlign="CENTER")
+        flowables.append(headingTest)
+        # why the test failed when it wasn't (only) a step, i.e. it couldn't be run or its capture failed
+        for reason in failure_reasons(dict):
+            flowables.append(Paragraph(escape(reason), style=styles["Normal"]))
+        flowables.append(testTable)
+
+    margin = 1 * inch
+    doc = SimpleDocTemplate(
+        filename,
+        pagesize=letter,
+        rightMargin=margin,
+        leftMargin=margin,
+        topMargin=margin,
+        bottomMargin=margin,
+    )
+    doc.build(flowables)
@@ -1,7 +1,145 @@
 import numpy as np 
-import matplotlib.pyplot as plt 
-import pandas as pd 
-from scipy import signal
+
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Finds the peaks of a capture and splits them the way the peak steps use them
+# Returns (peaks, prominences, left, top, right): peaks and their prominences from scipy, top the peaks whose
+# prominence is above the midpoint of the smallest and largest prominence, left the peak before each of those
+# and right the peak after each of them
+def compute_peak_features(data):
+    from scipy import signal  # imported on first use, it's slow to import and only the peak steps need it
+
+    peaks, _ = signal.find_peaks(data)
+    if len(peaks) == 0:
+        empty = np.zeros(0, dtype=np.intp)
+        return peaks, np.zeros(0), empty, empty, empty
+    prominences, _, _ = signal.peak_prominences(data, peaks)
+    selected = prominences > 0.5 * (np.min(prominences) + np.max(prominences))
+    left = peaks[:-1][selected[1:]]
+    top = peaks[selected]
+    right = peaks[1:][selected[:-1]]
+    return peaks, prominences, left, top, right
+
+# Keeps the peak features of the last few captures so find_peaks/peak_prominences run once per capture
+# no matter how many steps (and graph redraws) use them
+# Captures are keyed by the memory they view (address, shape, strides, dtype), so every view of the same
+# samples (i.e. testData[i][0], which is a new array object each time) shares one entry. The cache holds a
+# reference to each capture, so its memory can't be freed and reused by a different capture while the entry
+# exists. Captures are never changed in place after they are recorded; call invalidate() if one is.
+# max_entries - number of captures kept, the least recently used one is dropped first
+class PeakCache:
+    def __init__(self, max_entries=8):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # key -> (capture, features)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(data):
+        return (
+            data.__array_interface__["data"][0],
+            data.shape,
+            data.strides,
+            data.dtype.str,
+        )
+
+    # returns (peaks, prominences, left, top, right) for data (see compute_peak_features), read-only
+    def get(self, data):
+        data = np.asarray(data)
+        key = PeakCache.key(data)
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return entry[1]
+        self.misses += 1
+        features = compute_peak_features(data)
+        for array in features:
+            array.flags.writeable = False  # shared by every consumer
+        self.entries[key] = (data, features)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return features
+
+    # forgets the features of data, for captures that were changed in place
+    def invalidate(self, data):
+        self.entries.pop(PeakCache.key(np.asarray(data)), None)
+
+    def clear(self):
+        self.entries.clear()
+
+
+peak_cache = PeakCache()
+
+# Returns the (cached) peak features of a capture, see compute_peak_features
+def peak_features(data):
+    return peak_cache.get(data)
+
+# Returns (starts, peaks) of the rising edges timed by the rise time steps: one per peak in top except the
+# last, from the peak before it up to the peak
+# left has no entry for the first peak of the capture, so when that peak is in top the two are offset by one
+def rising_edges(left, top):
+    peaks = top[len(top) - len(left):]
+    n = max(len(top) - 1, 0)
+    return left[:n], peaks[:n]
+
+# Returns (peaks, ends) of the falling edges timed by the fall time steps: one per peak in top except the
+# last, from the peak down to the peak after it
+def falling_edges(top, right):
+    n = max(len(top) - 1, 0)
+    return top[:n], right[:n]
+
+# Returns, for every segment of a mask laid out segment after segment, the offset of the first True in the
+# segment (the segment length if there is none)
+# The True positions are sorted, so the first one at or after each segment's start is one searchsorted away
+def first_true(mask, first, lengths):
+    positions = np.flatnonzero(mask)
+    found = np.searchsorted(positions, first)
+    position = np.append(positions, len(mask))[found]
+    return np.minimum(position - first, lengths)
+
+# Returns the fractional sample offsets of the crossings of threshold in a layout of segments, interpolated
+# linearly between the last sample before each crossing and the first one past it
+# first_past - offset of the first sample past threshold in each segment (first_true of the past mask)
+def interpolate_crossings(samples, first, lengths, first_past, threshold):
+    crossing = first_past.astype(np.float64)
+    inside = (first_past > 0) & (first_past < lengths)  # crossed after the first sample of the segment
+    after = first[inside] + first_past[inside]
+    before_value = samples[after - 1]
+    step = samples[after] - before_value  # never 0, the sample before wasn't past the threshold
+    crossing[inside] += (threshold[inside] - before_value) / step - 1
+    return crossing
+
+# Times (ms) of the edges between starts[i] and ends[i] (both included) for i in range(len(peaks))
+# An edge starts where the signal first gets past start_percent of data[peaks[i]] and ends where it first gets
+# past end_percent of it, walking from starts[i] towards ends[i]. "Past" is >= for rising edges and <= for
+# falling. Both crossings are interpolated between samples, so the times aren't limited to whole samples.
+# An edge never past the start level is 0; one never past the end level ends at its last sample.
+# All edges are handled at once: their samples are laid out end to end in one array, the first sample past
+# each level is found with one searchsorted per level and the crossings are interpolated together
+def edge_times(data, starts, ends, peaks, start_percent, end_percent, sample_rate, rising):
+    n = len(peaks)
+    starts = np.asarray(starts[:n], dtype=np.intp)
+    # the end sample is part of the edge, a rising edge's end level may only be reached in its last interval
+    lengths = np.maximum(np.asarray(ends[:n], dtype=np.intp) - starts + 1, 0)
+    first = np.cumsum(lengths) - lengths  # where each edge starts in the layout
+    edge = np.repeat(np.arange(n), lengths)  # which edge every sample belongs to
+    samples = np.asarray(data[starts[edge] + np.arange(len(edge)) - first[edge]], dtype=np.float64)
+    peak_values = np.asarray(data[peaks], dtype=np.float64)
+    past = np.greater_equal if rising else np.less_equal
+    start_level = start_percent * 0.01 * peak_values
+    end_level = end_percent * 0.01 * peak_values
+    first_start = first_true(past(samples, start_level[edge]), first, lengths)
+    first_end = first_true(past(samples, end_level[edge]), first, lengths)
+    start = interpolate_crossings(samples, first, lengths, first_start, start_level)
+    end = interpolate_crossings(samples, first, lengths, first_end, end_level)
+    end = np.where(first_end < lengths, end, lengths - 1)  # never got past the end level
+    samples_taken = np.where(first_start < lengths, np.maximum(end - start, 0), 0)
+    return samples_taken * ((1 / sample_rate) * 1000)
+
 
 # Various signal analysis functions
 # Each step returns a results dict in the following format
@@ -18,81 +156,24 @@ class Analyzer:
     def __init__(self):
         self.data = [0]*50
 
-    def max_signal(data):
-        max = float('-inf')
-        for i in data:
-            if i > max:
-                max = i
-        return max
-
-    def min_signal(data):
-        min = float('inf')
-        for i in data:
-            if i < min:
-                min = i
-        return min
-    
+    # The single capture steps run the registered steps (see the step registry below), so there is one
+    # implementation of each; get_step_list runs all the enabled steps of a test at once, sharing intermediates
+
     # Test that determines if the signal every passes a minimum and maximum threshold
     # min_tol and  max_tol are the minimum and maximum tolerances for the signal, respectively
     def min_max_signal(self, data, min_tol, max_tol):
-        max = Analyzer.max_signal(data)
-        min = Analyzer.min_signal(data)
-        passes = False
-        if (max < max_tol) and (min > min_tol):
-            passes = True
-        results = {
-            "step_name" : "min_max_signal",
-            "status" : passes,
-            "measurement" : [min, max],
-            "units" : "N/A",
-            "low_limit" : min_tol,
-            "high_limit" : max_tol
-        }
-
-        return results
+        return min_max_signal_step(Capture(data, None).get("statistics"), min_tol, max_tol)
 
     # Test that finds all the peaks in the signal
     # The measurement is a list of three lists. The first list is the indicies of the left prominences of each peak,
     # the second is the indicies of the peaks themselves, and the third is the indicies of the right prominences of each peak.
     def find_peaks(self, data):
-        peaks, _ = signal.find_peaks(data)
-        prominences, _, _ = signal.peak_prominences(data, peaks)
-        selected = prominences > 0.5 * (np.min(prominences) + np.max(prominences))
-        left = peaks[:-1][selected[1:]]
-        right = peaks[1:][selected[:-1]]
-        top = peaks[selected]
-        
-        results = {
-            "step_name" : "find_peaks",
-            "status" : True,
-            "measurement" : [left, top, right],
-            "units" : "N/A",
-            "low limit" : "N/A",
-            "high limit" : "N/A"
-        }
-
-        return results 
+        return find_peaks_step(Capture(data, None).get("peaks"), True)
 
     # Test that checks if the average signal is within a bound
     # min_tol and  max_tol are the minimum and maximum tolerances for the average signal, respectively
     def avg_signal(self, data, min_tol, max_tol):
-        sum = 0
-        for i in data:
-            sum += i
-        average = (sum / len(data))
-        passes = True
-        if average < min_tol or average > max_tol:
-            passes = False
-        results = {
-            "step_name" : "average_signal",
-            "status" : passes,
-            "measurement" : average,
-            "units" : "N/A",
-            "low_limit" : min_tol,
-            "high_limit" : max_tol
-        }
-
-        return results
+        return average_signal_step(Capture(data, None).get("statistics"), min_tol, max_tol)
 
     # Test that finds the rise time for all peaks.
     # The measurement is a list of the rise times for each peak
@@ -103,44 +184,8 @@ class Analyzer:
     # The sample rate allows us to convert the number of samples (which is how the data arrray is formatted)
     # into time units
     def rise_time_all_peaks(self, data, start_percent, end_percent, min_tol, max_tol, sample_rate):
-        peaks, _ = signal.find_peaks(data)
-        prominences, _, _ = signal.peak_prominences(data, peaks)
-        selected = prominences > 0.5 * (np.min(prominences) + np.max(prominences))
-        left = peaks[:-1][selected[1:]]
-        rise_times = []
-        index = 0
-        top = peaks[selected]
-        if (len(top) == 0):
-            rise_times.append(0)
-            for i in range(left[pk], top[pk]):
-                if data[i] >= (start_percent * 0.01 * data[top[pk]]):
-                    rise_times[index] += ((1 / sample_rate) * 1000)
-                if data[i] >= (end_percent * 0.01 * data[top[pk]]):
-                    break
-            index += 1
-        else:
-            for pk in range(len(top) - 1):
-                rise_times.append(0)
-                for i in range(left[pk], top[pk]):
-                    if data[i] >= (start_percent * 0.01 * data[top[pk]]):
-                        rise_times[index] += ((1 / sample_rate) * 1000)
-                    if data[i] >= (end_percent * 0.01 * data[top[pk]]):
-                        break
-                index += 1
-        max_rise_time = max(rise_times)
-        min_rise_time = min(rise_times)
-        passes = True
-        if (max_rise_time > max_tol) or (min_rise_time < min_tol):
-            passes = False
-        results = {
-            "step_name" : "rise_time_peak",
-            "status" : passes,
-            "measurement" : rise_times,
-            "units" : "ms",
-            "low_limit" : min_tol,
-            "high_limit" : max_tol
-        }
-        return results
+        times = Capture(data, sample_rate).get("rise_times", (start_percent, end_percent))
+        return rise_time_peak_step(times, min_tol, max_tol)
 
     # Test that finds the fall time for fall peaks.
     # The measurement is a list of the fall times for each peak
@@ -151,44 +196,8 @@ class Analyzer:
     # The sample rate allows us to convert the number of samples (which is how the data arrray is formatted)
     # into time units
     def fall_time_all_peaks(self, data, start_percent, end_percent, min_tol, max_tol, sample_rate):
-        peaks, _ = signal.find_peaks(data)
-        prominences, _, _ = signal.peak_prominences(data, peaks)
-        selected = prominences > 0.5 * (np.min(prominences) + np.max(prominences))
-        right = peaks[1:][selected[:-1]]
-        fall_times = []
-        index = 0
-        top = peaks[selected]
-        if (len(top) == 0):
-            fall_times.append(0)
-            for i in range(top[pk], right[pk]):
-                if data[i] <= (start_percent * 0.01 * data[top[pk]]):
-                    fall_times[index] += ((1 / sample_rate) * 1000)
-                if data[i] <= (end_percent * 0.01 * data[top[pk]]):
-                    break
-            index += 1
-        else:
-            for pk in range(len(top) - 1):
-                fall_times.append(0)
-                for i in range(top[pk], right[pk]):
-                    if data[i] <= (start_percent * 0.01 * data[top[pk]]):
-                        fall_times[index] += ((1 / sample_rate) * 1000)
-                    if data[i] <= (end_percent * 0.01 * data[top[pk]]):
-                        break
-                index += 1
-        max_fall_time = max(fall_times)
-        min_fall_time = min(fall_times)
-        passes = True
-        if (max_fall_time > max_tol) or (min_fall_time < min_tol):
-            passes = False
-        results = {
-            "step_name" : "fall_time_peak",
-            "status" : passes,
-            "measurement" : fall_times,
-            "units" : "ms",
-            "low_limit" : min_tol,
-            "high_limit" : max_tol
-        }
-        return results
+        times = Capture(data, sample_rate).get("fall_times", (start_percent, end_percent))
+        return fall_time_peak_step(times, min_tol, max_tol)
     
     # Test that finds the average rise time
     # The start_percent is the percent of the peak where rise time will start being counted
@@ -197,24 +206,8 @@ class Analyzer:
     # The sample rate allows us to convert the number of samples (which is how the data arrray is formatted)
     # into time units
     def avg_rise_time(self, data, start_percent, end_percent, min_tol, max_tol, sample_rate):
-        prev_results = self.rise_time_all_peaks(data, start_percent, end_percent, min_tol, max_tol, sample_rate)
-        rise_times = prev_results["measurement"]
-        sum = 0
-        for x in rise_times:
-            sum += x
-        average = sum / len(rise_times)
-        passes = True
-        if (average > max_tol) or (average < min_tol):
-            passes = False
-        results = {
-            "step_name" : "avg_rise_time",
-            "status" : passes,
-            "measurement" : average,
-            "units" : "ms",
-            "low_limit" : min_tol,
-            "high_limit" : max_tol
-        }
-        return results
+        times = Capture(data, sample_rate).get("rise_times", (start_percent, end_percent))
+        return avg_rise_time_step(times, min_tol, max_tol)
     
     # Test that finds the average fall time
     # The start_percent is the percent of the peak where fall time will start being counted
@@ -223,23 +216,440 @@ class Analyzer:
     # The sample rate allows us to convert the number of samples (which is how the data arrray is formatted)
     # into time units
     def avg_fall_time(self, data, start_percent, end_percent, min_tol, max_tol, sample_rate):
-        prev_results = self.fall_time_all_peaks(data, start_percent, end_percent, min_tol, max_tol, sample_rate)
-        fall_times = prev_results["measurement"]
-        sum = 0
-        for x in fall_times:
-            sum += x
-        average = sum / len(fall_times)
-        passes = True
-        if (average > max_tol) or (average < min_tol):
-            passes = False
+        times = Capture(data, sample_rate).get("fall_times", (start_percent, end_percent))
+        return avg_fall_time_step(times, min_tol, max_tol)
+
+    # Batch versions of the steps for an (N_captures x N_samples) array of repeated captures of one test
+    # Each returns one dict for the whole batch, in the step dict format except that "status" is a boolean
+    # array with the pass/fail of every capture and "measurement" holds the measurement of every capture
+    # (an array, or a list of per capture lists for the all peaks steps)
+
+    # measurement is an (N x 2) array of the [min, max] of each capture
+    def batch_min_max_signal(self, data, min_tol, max_tol):
+        data = np.atleast_2d(data)
+        minimum = np.min(data, axis=1)
+        maximum = np.max(data, axis=1)
+        results = {
+            "step_name" : "min_max_signal",
+            "status" : (maximum < max_tol) & (minimum > min_tol),
+            "measurement" : np.stack((minimum, maximum), axis=1),
+            "units" : "N/A",
+            "low_limit" : min_tol,
+            "high_limit" : max_tol
+        }
+        return results
+
+    # measurement is an array of the average of each capture
+    def batch_avg_signal(self, data, min_tol, max_tol):
+        average = np.mean(np.atleast_2d(data), axis=1)
         results = {
-            "step_name" : "avg_fall_time",
-            "status" : passes,
+            "step_name" : "average_signal",
+            "status" : (average >= min_tol) & (average <= max_tol),
             "measurement" : average,
+            "units" : "N/A",
+            "low_limit" : min_tol,
+            "high_limit" : max_tol
+        }
+        return results
+
+    # Edge times of every capture, measured like rise_time_all_peaks/fall_time_all_peaks
+    # Peaks are found per capture (scipy works on one signal at a time), then the edges of all captures are
+    # timed in one edge_times call over the flattened batch
+    # Returns (times, counts): the edge times of all captures end to end and the number belonging to each
+    # capture; a capture without edges gets a single 0, like the single capture steps
+    def batch_edge_times(self, data, start_percent, end_percent, sample_rate, rising):
+        data = np.atleast_2d(data)
+        n_captures, n_samples = data.shape
+        starts, ends, peaks = [], [], []
+        for i in range(n_captures):
+            # not through peak_cache, a batch would push every single capture out of it
+            _, _, left, top, right = compute_peak_features(data[i])
+            offset = i * n_samples
+            if rising:
+                start, peak = rising_edges(left, top)
+                end = peak
+            else:
+                peak, end = falling_edges(top, right)
+                start = peak
+            starts.append(start + offset)
+            ends.append(end + offset)
+            peaks.append(peak + offset)
+        counts = np.array([len(p) for p in peaks])
+        times = edge_times(
+            np.ravel(data),
+            np.concatenate(starts),
+            np.concatenate(ends),
+            np.concatenate(peaks),
+            start_percent,
+            end_percent,
+            sample_rate,
+            rising,
+        )
+        empty = np.flatnonzero(counts == 0)
+        if len(empty) > 0:
+            times = np.insert(times, np.cumsum(counts)[empty], 0.0)
+            counts[empty] = 1
+        return times, counts
+
+    # measurement is a list with the rise times of each capture; "min", "max" and "mean" are arrays of their
+    # minimum, maximum and average per capture
+    def batch_rise_time_all_peaks(self, data, start_percent, end_percent, min_tol, max_tol, sample_rate):
+        return self.batch_all_peaks("rise_time_peak", data, start_percent, end_percent, min_tol, max_tol, sample_rate, True)
+
+    # measurement is a list with the fall times of each capture; "min", "max" and "mean" as above
+    def batch_fall_time_all_peaks(self, data, start_percent, end_percent, min_tol, max_tol, sample_rate):
+        return self.batch_all_peaks("fall_time_peak", data, start_percent, end_percent, min_tol, max_tol, sample_rate, False)
+
+    def batch_all_peaks(self, step_name, data, start_percent, end_percent, min_tol, max_tol, sample_rate, rising):
+        times, counts = self.batch_edge_times(data, start_percent, end_percent, sample_rate, rising)
+        first = np.cumsum(counts) - counts
+        minimum = np.minimum.reduceat(times, first)
+        maximum = np.maximum.reduceat(times, first)
+        mean = np.add.reduceat(times, first) / counts
+        results = {
+            "step_name" : step_name,
+            "status" : (maximum <= max_tol) & (minimum >= min_tol),
+            "measurement" : [t.tolist() for t in np.split(times, first[1:])],
+            "min" : minimum,
+            "max" : maximum,
+            "mean" : mean,
             "units" : "ms",
             "low_limit" : min_tol,
             "high_limit" : max_tol
         }
         return results
 
+    # measurement is an array of the average rise time of each capture
+    def batch_avg_rise_time(self, data, start_percent, end_percent, min_tol, max_tol, sample_rate):
+        times, counts = self.batch_edge_times(data, start_percent, end_percent, sample_rate, True)
+        return self.batch_average("avg_rise_time", times, counts, min_tol, max_tol)
+
+    # measurement is an array of the average fall time of each capture
+    def batch_avg_fall_time(self, data, start_percent, end_percent, min_tol, max_tol, sample_rate):
+        times, counts = self.batch_edge_times(data, start_percent, end_percent, sample_rate, False)
+        return self.batch_average("avg_fall_time", times, counts, min_tol, max_tol)
+
+    def batch_average(self, step_name, times, counts, min_tol, max_tol):
+        average = np.add.reduceat(times, np.cumsum(counts) - counts) / counts
+        results = {
+            "step_name" : step_name,
+            "status" : (average >= min_tol) & (average <= max_tol),
+            "measurement" : average,
+            "units" : "ms",
+            "low_limit" : min_tol,
+            "high_limit" : max_tol
+        }
+        return results
+
+
+# Runs the limit steps of a test on a capture while it is being read, one block of samples at a time, so their
+# pass/fail is known as soon as the capture ends
+# Keeps the running minimum/maximum and the mean (merged a block at a time)
+# params - the test config; min_max_signal and average_signal are streamed, the same way Analyzer runs them
+# abort_on_fail - update() returns False as soon as a streamed step can no longer pass (the first sample
+#                 outside the min/max limits fails min_max_signal for good), so the capture can be stopped
+# Edges aren't streamed: the rise and fall time steps take their edges from the peaks' prominences and bases
+# (see peak_features), which depend on the whole capture, so they still run once it has been read
+class StreamingAnalyzer:
+
+    def __init__(self, params, abort_on_fail=False):
+        self.min_tol = params.get("min_sig", "N/A")
+        self.max_tol = params.get("max_sig", "N/A")
+        self.avg_min_tol = params.get("avg_sig_min_tol", "N/A")
+        self.avg_max_tol = params.get("avg_sig_max_tol", "N/A")
+        self.abort_on_fail = abort_on_fail
+        self.count = 0
+        self.minimum = float('inf')
+        self.maximum = float('-inf')
+        self.mean = 0.0
+        self.aborted = False
+
+    # adds the next block of samples of the capture; returns False if the capture should be stopped
+    def update(self, samples):
+        samples = np.asarray(samples, dtype=np.float64)
+        n = len(samples)
+        if n == 0:
+            return not self.aborted
+        self.minimum = min(self.minimum, float(np.min(samples)))
+        self.maximum = max(self.maximum, float(np.max(samples)))
+        total = self.count + n
+        self.mean += (float(np.mean(samples)) - self.mean) * n / total
+        self.count = total
+        if self.abort_on_fail and not self.min_max_passes():
+            self.aborted = True
+        return not self.aborted
+
+    def min_max_passes(self):
+        if self.min_tol == "N/A" or self.max_tol == "N/A":
+            return True
+        return (self.maximum < self.max_tol) and (self.minimum > self.min_tol)
+
+    # returns the step dicts of the streamed steps the test sets, in the format of the Analyzer steps
+    def results(self):
+        step_list = []
+        if self.count == 0:
+            return step_list
+        if self.min_tol != "N/A" and self.max_tol != "N/A":
+            step_list.append({
+                "step_name" : "min_max_signal",
+                "status" : self.min_max_passes(),
+                "measurement" : [self.minimum, self.maximum],
+                "units" : "N/A",
+                "low_limit" : self.min_tol,
+                "high_limit" : self.max_tol
+            })
+        if self.avg_min_tol != "N/A" and self.avg_max_tol != "N/A":
+            step_list.append({
+                "step_name" : "average_signal",
+                "status" : self.avg_min_tol <= self.mean <= self.avg_max_tol,
+                "measurement" : self.mean,
+                "units" : "N/A",
+                "low_limit" : self.avg_min_tol,
+                "high_limit" : self.avg_max_tol
+            })
+        return step_list
+
+
+# Step registry
+# Each step of a test declares the test config fields it takes and the intermediates it needs, and the planner
+# works out which intermediates the enabled steps of a test need and computes each one once per capture. A new
+# step only has to be registered here (or in a module imported alongside this one); get_step_list picks it up
+#
+# Intermediates are computed from a Capture and the intermediates they require themselves:
+#   @register_intermediate("name", requires=("other",), args=("arg",))
+#   def name(capture, other, arg): ...
+# args are values the requiring step passes in (i.e. percentages); the result is kept per (name, args)
+#
+# Steps take the intermediates they require, then the values of their params in order, and return a results
+# dict in the Analyzer format. A step runs when all of its params are set (not "N/A") in the test config:
+#   @register_step("name", params=("low_field", "high_field"), requires=("statistics",))
+#   def name(statistics, low, high): ...
+# A requirement is either an intermediate name or (name, param, ...), which passes the values of those test
+# config fields as the intermediate's args. Steps run in the order they were registered.
+
+INTERMEDIATES = {}  # name -> (function, requirements, args)
+STEPS = []  # (name, function, params, requirements) in run order
+
+def register_intermediate(name, requires=(), args=()):
+    def register(function):
+        INTERMEDIATES[name] = (function, tuple(requires), tuple(args))
+        return function
+    return register
+
+def register_step(name, params=(), requires=()):
+    def register(function):
+        STEPS[:] = [step for step in STEPS if step[0] != name]  # re-registering replaces the step
+        STEPS.append((name, function, tuple(params), tuple(requires)))
+        return function
+    return register
+
+# A capture being analysed and the intermediates computed for it so far
+class Capture:
+
+    def __init__(self, data, sample_rate):
+        self.data = np.asarray(data)
+        self.sample_rate = sample_rate
+        self.computed = {}  # (name, args) -> value
+
+    # returns intermediate name for args, computing it (and what it requires) the first time it is asked for
+    def get(self, name, args=()):
+        key = (name, tuple(args))
+        if key not in self.computed:
+            if name not in INTERMEDIATES:
+                raise KeyError("No intermediate named " + repr(name) + " is registered")
+            function, requires, _ = INTERMEDIATES[name]
+            inputs = [self.get(requirement) for requirement in requires]
+            self.computed[key] = function(self, *inputs, *args)
+        return self.computed[key]
+
+# True if a test config field is set
+def is_set(value):
+    return value is not None and value is not False and not (isinstance(value, str) and value == "N/A")
+
+# Returns a results dict for a step with limits, in the format of the Analyzer steps
+def step_results(step_name, passes, measurement, units, low_limit, high_limit):
+    results = {
+        "step_name" : step_name,
+        "status" : passes,
+        "measurement" : measurement,
+        "units" : units,
+        "low_limit" : low_limit,
+        "high_limit" : high_limit
+    }
+    return results
+
+# Works out and runs the enabled steps of a test
+class StepPlanner:
+
+    def __init__(self, steps=None):
+        self.steps = STEPS if steps is None else steps
+
+    # returns the registered steps whose params (and the params they pass to intermediates) are all set
+    def plan(self, params):
+        planned = []
+        for step in self.steps:
+            fields = list(step[2])
+            for requirement in step[3]:
+                if not isinstance(requirement, str):
+                    fields.extend(requirement[1:])
+            if all(is_set(params.get(field, "N/A")) for field in fields):
+                planned.append(step)
+        return planned
+
+    # returns the results of the enabled steps of a test on one capture
+    def run(self, data, params):
+        capture = Capture(data, params.get("sample_rate", "N/A"))
+        step_list = []
+        for name, function, fields, requires in self.plan(params):
+            inputs = []
+            for requirement in requires:
+                if isinstance(requirement, str):
+                    inputs.append(capture.get(requirement))
+                else:
+                    args = [params[field] for field in requirement[1:]]
+                    inputs.append(capture.get(requirement[0], args))
+            step_list.append(function(*inputs, *[params[field] for field in fields]))
+        return step_list
+
+
+default_planner = StepPlanner()
+
+# Returns a list of dicts where each dict is the results of a step in a test
+# The steps in the test are the registered steps whose fields in the test configuration are not set to "N/A"
+# Runs in the analysis worker processes, so it only uses the arguments and module level state
+# An empty capture (i.e. the acquisition failed before its first block) has nothing to measure, so no steps are
+# run; its test is failed by the error the capture ended with (see project.test_results)
+def get_step_list(data, params):
+    if len(data) == 0:
+        return []
+    return default_planner.run(data, params)
+
+
+@register_intermediate("statistics")
+def statistics(capture):
+    return {
+        "min" : float(np.min(capture.data)),
+        "max" : float(np.max(capture.data)),
+        "mean" : float(np.mean(capture.data)),
+    }
+
+# (peaks, prominences, left, top, right), see compute_peak_features
+@register_intermediate("peaks")
+def peaks(capture):
+    return peak_features(capture.data)
+
+@register_intermediate("rising_edges", requires=("peaks",))
+def rising_edge_intermediate(capture, peaks):
+    return rising_edges(peaks[2], peaks[3])
+
+@register_intermediate("falling_edges", requires=("peaks",))
+def falling_edge_intermediate(capture, peaks):
+    return falling_edges(peaks[3], peaks[4])
+
+# rise times (ms) of the rising edges between start_percent and end_percent, [0] if there are none
+@register_intermediate("rise_times", requires=("rising_edges",), args=("start_percent", "end_percent"))
+def rise_times(capture, edges, start_percent, end_percent):
+    starts, peaks = edges
+    times = edge_times(capture.data, starts, peaks, peaks, start_percent, end_percent, capture.sample_rate, True)
+    return times.tolist() if len(times) > 0 else [0]
+
+# fall times (ms) of the falling edges between start_percent and end_percent, [0] if there are none
+@register_intermediate("fall_times", requires=("falling_edges",), args=("start_percent", "end_percent"))
+def fall_times(capture, edges, start_percent, end_percent):
+    peaks, ends = edges
+    times = edge_times(capture.data, peaks, ends, peaks, start_percent, end_percent, capture.sample_rate, False)
+    return times.tolist() if len(times) > 0 else [0]
+
+
+@register_step("min_max_signal", params=("min_sig", "max_sig"), requires=("statistics",))
+def min_max_signal_step(stats, min_tol, max_tol):
+    passes = (stats["max"] < max_tol) and (stats["min"] > min_tol)
+    return step_results("min_max_signal", passes, [stats["min"], stats["max"]], "N/A", min_tol, max_tol)
+
+@register_step("average_signal", params=("avg_sig_min_tol", "avg_sig_max_tol"), requires=("statistics",))
+def average_signal_step(stats, min_tol, max_tol):
+    passes = min_tol <= stats["mean"] <= max_tol
+    return step_results("average_signal", passes, stats["mean"], "N/A", min_tol, max_tol)
+
+@register_step(
+    "rise_time_peak",
+    params=("rise_time_min_tol", "rise_time_max_tol"),
+    requires=(("rise_times", "rise_start_percent", "rise_end_percent"),),
+)
+def rise_time_peak_step(times, min_tol, max_tol):
+    passes = (max(times) <= max_tol) and (min(times) >= min_tol)
+    return step_results("rise_time_peak", passes, times, "ms", min_tol, max_tol)
+
+@register_step(
+    "fall_time_peak",
+    params=("fall_time_min_tol", "fall_time_max_tol"),
+    requires=(("fall_times", "fall_start_percent", "fall_end_percent"),),
+)
+def fall_time_peak_step(times, min_tol, max_tol):
+    passes = (max(times) <= max_tol) and (min(times) >= min_tol)
+    return step_results("fall_time_peak", passes, times, "ms", min_tol, max_tol)
+
+@register_step(
+    "avg_rise_time",
+    params=("avg_rise_min_tol", "avg_rise_max_tol"),
+    requires=(("rise_times", "avg_rise_start_percent", "avg_rise_end_percent"),),
+)
+def avg_rise_time_step(times, min_tol, max_tol):
+    average = float(np.mean(times))
+    return step_results("avg_rise_time", min_tol <= average <= max_tol, average, "ms", min_tol, max_tol)
+
+@register_step(
+    "avg_fall_time",
+    params=("avg_fall_min_tol", "avg_fall_max_tol"),
+    requires=(("fall_times", "avg_fall_start_percent", "avg_fall_end_percent"),),
+)
+def avg_fall_time_step(times, min_tol, max_tol):
+    average = float(np.mean(times))
+    return step_results("avg_fall_time", min_tol <= average <= max_tol, average, "ms", min_tol, max_tol)
+
+@register_step("find_peaks", params=("find_peaks",), requires=("peaks",))
+def find_peaks_step(peaks, enabled):
+    _, _, left, top, right = peaks
+    results = {
+        "step_name" : "find_peaks",
+        "status" : True,
+        "measurement" : [left, top, right],
+        "units" : "N/A",
+        "low limit" : "N/A",
+        "high limit" : "N/A"
+    }
+    return results
+
+
+# Runs get_step_list for the tests of a suite in a pool of worker processes, so a suite is analysed on every
+# core and the caller (the Qt thread) never waits on it
+# The workers are spawned the first time they are needed (each one imports the main module again, like the
+# daq.ProcessReader child) and are kept for the next suites
+# max_workers - None for one per core
+class AnalysisPool:
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers
+        self.executor = None
+
+    # returns a concurrent.futures.Future of get_step_list(data, params)
+    def submit(self, data, params):
+        data = np.ascontiguousarray(data)
+        try:
+            return self.start().submit(get_step_list, data, params)
+        except BrokenProcessPool:  # a worker died, start over with a new pool
+            self.executor = None
+            return self.start().submit(get_step_list, data, params)
+
+    def start(self):
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(
+                self.max_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self.executor
 
+    # stops the workers, dropping analyses that haven't started
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
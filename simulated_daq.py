@@ -0,0 +1,297 @@
+import argparse
+import threading
+import time
+import numpy as np
+
+from daq import AcquisitionError
+
+
+# Pure-numpy stand-in for an NI DAQ so the tester can be run, profiled and load tested without hardware.
+# Select it with SUCT_BACKEND=sim or daq.set_backend(SimulatedBackend(...)) before creating a Reader/Generator.
+# Analog outputs are looped back into the analog inputs: DevN/aiK reads whatever DevN/ao(K % ao_count) is
+# generating, unless set_waveform() gave that input its own signal.
+# noise - standard deviation (volts) of the gaussian noise added to every input sample
+# realtime - if True reads are paced by the sample clock, if False samples are produced as fast as they
+#            are read (for benchmarking the acquisition -> analysis pipeline)
+# overrun_after - raise a buffer overrun once an input task has read this many samples (None to disable)
+class SimulatedBackend:
+    def __init__(
+        self,
+        device_name="Dev1",
+        ai_count=8,
+        ao_count=2,
+        noise=0.01,
+        realtime=True,
+        overrun_after=None,
+        seed=None,
+    ):
+        self.device_name = device_name
+        self.ai_count = ai_count
+        self.ao_count = ao_count
+        self.noise = noise
+        self.realtime = realtime
+        self.overrun_after = overrun_after
+        self.rng = np.random.default_rng(seed)
+        self.outputs = {}  # ao channel -> (waveform, sample_rate, start_time) of the running output tasks
+        self.waveforms = {}  # ai channel -> function of time (s) that replaces the loopback
+        self.lock = threading.Lock()
+
+    # the lock can't be pickled; a ProcessReader sends the child process a snapshot of the backend
+    # (including the outputs running at that moment) with every read
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state["lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def discover(self):
+        ai = [self.device_name + "/ai" + str(i) for i in range(self.ai_count)]
+        ao = [self.device_name + "/ao" + str(i) for i in range(self.ao_count)]
+        return [self.device_name], {self.device_name: ai}, {self.device_name: ao}
+
+    def open_input(self, channels, sample_rate, buffer_size, sync_output=None, trigger=None):
+        return SimulatedInputTask(
+            self, channels, sample_rate, buffer_size, sync_output, trigger
+        )
+
+    def open_output(self, channel, waveform, sample_rate):
+        return SimulatedOutputTask(self, channel, waveform, sample_rate)
+
+    # Gives an input channel its own signal instead of the loopback
+    # input: channel - i.e. "Dev1/ai0", function - takes a numpy array of times (s) and returns volts
+    def set_waveform(self, channel, function):
+        self.waveforms[channel] = function
+
+    # returns the analog output an analog input is wired to
+    def loopback_channel(self, channel):
+        device, name = channel.split("/")
+        index = int(name[len("ai") :]) % max(self.ao_count, 1)
+        return device + "/ao" + str(index)
+
+    # returns the voltages seen on an input channel at the given times (s, on the time.perf_counter clock)
+    def sample(self, channel, t):
+        if channel in self.waveforms:
+            values = np.asarray(self.waveforms[channel](t), dtype=np.float64)
+        else:
+            with self.lock:
+                output = self.outputs.get(self.loopback_channel(channel))
+            if output is None:
+                values = np.zeros(len(t))
+            else:
+                # zero-order hold, like the DAC holding each output sample until the next clock edge
+                waveform, sample_rate, start_time = output
+                # (the small offset keeps samples taken exactly on an output clock edge on that edge)
+                index = np.floor((t - start_time) * sample_rate + 1e-6).astype(np.int64)
+                values = waveform[index % len(waveform)]
+        if self.noise:
+            values = values + self.rng.normal(0, self.noise, len(t))
+        return values
+
+
+# Simulated continuous analog input task sampling a list of channels off one clock
+# With a sync_output the input is clocked by that output: its first sample is taken when the output starts
+# An "Analog Edge" trigger is found by searching the source channel for the level crossing, the first sample
+# returned is then pretrigger_samples before it. There are no digital lines, so a "Digital Edge" trigger
+# fires straight away
+class SimulatedInputTask:
+    def __init__(self, backend, channels, sample_rate, buffer_size, sync_output=None, trigger=None):
+        self.backend = backend
+        self.channels = list(channels)
+        self.sample_rate = sample_rate
+        self.buffer_size = buffer_size
+        self.sync_output = sync_output
+        self.trigger = trigger
+        self.start_time = None
+        self.samples_read = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def start(self):
+        self.samples_read = 0
+        if self.sync_output is None:
+            self.start_time = time.perf_counter()
+
+    # reads n samples per channel into the (channels x n) array out, waiting for the simulated sample clock
+    # if the backend is realtime
+    def read(self, out, n, timeout):
+        if self.start_time is None:  # armed, waiting for the output's start trigger
+            if not self.sync_output.started.wait(timeout):
+                raise AcquisitionError("Read timed out waiting for the start trigger")
+            self.start_time = self.sync_output.start_time
+        if self.trigger is not None and self.trigger["type"] == "Analog Edge":
+            self.find_trigger()
+        overrun_after = self.backend.overrun_after
+        if overrun_after is not None and self.samples_read + n > overrun_after:
+            raise AcquisitionError(
+                "Simulated buffer overrun after " + str(self.samples_read) + " samples"
+            )
+        if self.backend.realtime:
+            now = time.perf_counter()
+            waiting = (now - self.start_time) * self.sample_rate - self.samples_read
+            if waiting > self.buffer_size:  # the reader fell behind the sample clock
+                raise AcquisitionError(
+                    "Buffer overrun: "
+                    + str(int(waiting))
+                    + " samples waiting in a "
+                    + str(self.buffer_size)
+                    + " sample buffer"
+                )
+            wait = self.start_time + (self.samples_read + n) / self.sample_rate - now
+            if wait > timeout:
+                time.sleep(timeout)
+                raise AcquisitionError("Read timed out waiting for samples")
+            if wait > 0:
+                time.sleep(wait)
+        t = self.start_time + (self.samples_read + np.arange(n)) / self.sample_rate
+        for i, channel in enumerate(self.channels):
+            out[i, :n] = self.backend.sample(channel, t)
+        self.samples_read += n
+
+    # moves start_time to pretrigger_samples before the first crossing of the trigger level on the source
+    def find_trigger(self):
+        from daq import find_level_crossing
+
+        block = 4096
+        searched = 0
+        previous = None
+        rising = self.trigger["slope"] != "Falling"
+        while searched < self.trigger["timeout"] * self.sample_rate:
+            t = self.start_time + (searched + np.arange(block)) / self.sample_rate
+            samples = self.backend.sample(self.trigger["source"], t)
+            crossing = find_level_crossing(samples, self.trigger["level"], rising, previous)
+            if crossing is not None:
+                trigger_sample = searched + crossing - self.trigger["pretrigger_samples"]
+                self.start_time += trigger_sample / self.sample_rate
+                self.trigger = None
+                return
+            previous = samples[-1]
+            searched += block
+        raise AcquisitionError("No trigger within " + str(self.trigger["timeout"]) + " s")
+
+    def close(self):
+        pass
+
+
+# Simulated regenerating analog output task; while started its waveform is visible to the loopback inputs
+class SimulatedOutputTask:
+    def __init__(self, backend, channel, waveform, sample_rate):
+        self.backend = backend
+        self.channel = channel
+        self.waveform = np.asarray(waveform, dtype=np.float64)
+        self.sample_rate = sample_rate
+        self.start_time = None
+        self.started = threading.Event()  # the start trigger of synchronized inputs
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def start(self):
+        self.start_time = time.perf_counter()
+        with self.backend.lock:
+            self.backend.outputs[self.channel] = (
+                self.waveform,
+                self.sample_rate,
+                self.start_time,
+            )
+        self.started.set()
+
+    def stop(self):
+        with self.backend.lock:
+            self.backend.outputs.pop(self.channel, None)
+
+    def close(self):
+        self.stop()
+
+
+# test config with every analysis step enabled, so the benchmark runs the whole analysis of a test
+BENCHMARK_TEST = {
+    "name": "benchmark",
+    "min_sig": -10.0,
+    "max_sig": 10.0,
+    "avg_sig_min_tol": -1.0,
+    "avg_sig_max_tol": 1.0,
+    "find_peaks": True,
+    "rise_start_percent": 10,
+    "rise_end_percent": 90,
+    "rise_time_min_tol": 0.0,
+    "rise_time_max_tol": 1000.0,
+    "fall_start_percent": 10,
+    "fall_end_percent": 90,
+    "fall_time_min_tol": 0.0,
+    "fall_time_max_tol": 1000.0,
+    "avg_rise_start_percent": 10.0,
+    "avg_rise_end_percent": 90.0,
+    "avg_rise_min_tol": 0.0,
+    "avg_rise_max_tol": 1000.0,
+    "avg_fall_start_percent": 10.0,
+    "avg_fall_end_percent": 90.0,
+    "avg_fall_min_tol": 0.0,
+    "avg_fall_max_tol": 1000.0,
+}
+
+
+# Benchmarks acquisition, analysis (every step) and report writing of a simulated square wave without hardware
+# i.e. python simulated_daq.py --sample-rate 100000 --duration 10
+def main():
+    import os
+    import tempfile
+    from daq import Reader, Generator
+    from signal_analysis import StreamingAnalyzer, get_step_list
+    from project import test_results
+    from report_writer import create_header, write_json, write_pdf
+
+    parser = argparse.ArgumentParser(description="Benchmark the tester on a simulated DAQ")
+    parser.add_argument("--sample-rate", type=float, default=100000)
+    parser.add_argument("--duration", type=float, default=1.0)
+    parser.add_argument("--signal", default="Square")
+    parser.add_argument("--realtime", action="store_true", help="pace reads by the sample clock")
+    args = parser.parse_args()
+
+    backend = SimulatedBackend(realtime=args.realtime, seed=0)
+    reader = Reader(backend)
+    generator = Generator(backend)
+    generator.set_signal(args.signal)
+    generator.set_stimulus({"signal_sample_rate": args.sample_rate})
+    generator.start_generator_thread()
+    time.sleep(0.05)  # let the output task start
+
+    start = time.perf_counter()
+    reader.read(args.sample_rate, args.duration)
+    acquired = time.perf_counter()
+    generator.kill_generator_thread()
+    generator.join_generator_thread()
+    data = reader.getArray()[0]
+
+    testDict = dict(BENCHMARK_TEST, sample_rate=args.sample_rate, test_duration=args.duration)
+    streamer = StreamingAnalyzer(testDict)
+    streamer.update(data)
+    results = [test_results(testDict["name"], get_step_list(data, testDict), streamer)]
+    analyzed = time.perf_counter()
+
+    with tempfile.TemporaryDirectory() as directory:
+        header = create_header(results, "benchmark", 1)
+        write_json(os.path.join(directory, "report.json"), header, results)
+        written_json = time.perf_counter()
+        write_pdf(os.path.join(directory, "report.pdf"), header, results)
+        written_pdf = time.perf_counter()
+
+    print("samples:     ", len(data))
+    print("steps:       ", len(results[0]["results"]))
+    print("acquisition: ", round(acquired - start, 3), "s")
+    print("analysis:    ", round(analyzed - acquired, 3), "s")
+    print("json report: ", round(written_json - analyzed, 3), "s")
+    print("pdf report:  ", round(written_pdf - written_json, 3), "s")
+
+
+if __name__ == "__main__":
+    main()
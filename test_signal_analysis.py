@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from signal_analysis import Analyzer, get_step_list
+
+
+# 5 periods of a 10 ms signal that ramps from 0 to 5 V in 1 ms and straight back down, so each peak is the
+# last sample of its rising edge; a small bump at 2 ms gives the flat part a low peak to start the rise from
+def ramp_capture(sample_rate, periods=5):
+    t = np.arange(int(round(sample_rate * 0.01))) / sample_rate
+    period = np.interp(t, [0, 0.004, 0.005, 0.006, 0.010], [0, 0, 5, 0, 0])
+    period[int(round(sample_rate * 0.002))] = 0.01
+    return np.tile(period, periods)
+
+
+EDGE_PARAMS = {
+    "rise_time_min_tol": 0,
+    "rise_time_max_tol": 5,
+    "rise_start_percent": 10,
+    "rise_end_percent": 90,
+    "fall_time_min_tol": 0,
+    "fall_time_max_tol": 5,
+    "fall_start_percent": 90,
+    "fall_end_percent": 10,
+}
+
+
+# the 10-90% edges of the ramp are 0.8 ms long, the interpolated crossings measure that at any sample rate
+@pytest.mark.parametrize("sample_rate", [2000, 4000, 5000, 8000, 10000, 100000])
+def test_edge_times_match_across_sample_rates(sample_rate):
+    params = dict(EDGE_PARAMS, sample_rate=sample_rate)
+    steps = {step["step_name"]: step for step in get_step_list(ramp_capture(sample_rate), params)}
+    assert np.allclose(steps["rise_time_peak"]["measurement"], 0.8)
+    assert np.allclose(steps["fall_time_peak"]["measurement"], 0.8)
+
+
+@pytest.mark.parametrize("sample_rate", [2000, 10000])
+def test_batch_rise_times_match_single_capture(sample_rate):
+    data = np.vstack([ramp_capture(sample_rate)] * 3)
+    results = Analyzer().batch_avg_rise_time(data, 10, 90, 0, 5, sample_rate)
+    assert np.allclose(results["measurement"], 0.8)